@@ -0,0 +1,176 @@
+#!/usr/bin/env python2
+from __future__ import print_function
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import timeit
+import rgkit.rg
+import rgprofile
+import rgtuner
+from rgtuner import Variant
+
+# robots on the board in each of the game states act() is timed on
+STATE_ROBOTS = 40
+
+
+class StateBot(dict):
+    """A robot of a benchmark game state, which the bots can read like the
+    ones rgkit gives them."""
+    __getattr__ = dict.__getitem__
+
+
+def make_states(count, seed):
+    """Returns count game states with STATE_ROBOTS robots of two players in
+    random squares of the map, always the same ones for the same seed.
+    Their turns count up from 1 to 99, and over again."""
+    rng = random.Random(seed)
+    squares = [(x, y) for x in xrange(19) for y in xrange(19)
+               if not set(['obstacle', 'invalid']) &
+               set(rgkit.rg.loc_types((x, y)))]
+    states = []
+    for i in xrange(count):
+        robots = {}
+        for robot_id, loc in enumerate(rng.sample(squares, STATE_ROBOTS)):
+            robots[loc] = StateBot(location=loc, hp=rng.randint(1, 50),
+                                   player_id=robot_id % 2, robot_id=robot_id)
+        states.append({'turn': i % 99 + 1, 'robots': robots})
+    return states
+
+
+def bench_act(bot, states):
+    """Times the act() calls of the robots of player 0 on each of states.
+    Returns the turns per second and the latency of a turn, and the hits and
+    misses of the bot's per-turn caches if it has a memo_stats() like
+    sbase.py's."""
+    module = rgtuner.load_bot(bot, 0)
+    robot = module.Robot()
+    times = []
+    for state in states:
+        start = timeit.default_timer()
+        for loc, state_bot in sorted(state['robots'].items()):
+            if state_bot.player_id == 0:
+                robot.location = loc
+                robot.hp = state_bot.hp
+                robot.player_id = state_bot.player_id
+                robot.robot_id = state_bot.robot_id
+                robot.act(state)
+        times.append(timeit.default_timer() - start)
+    total = sum(times)
+    times.sort()
+    results = {'turns': len(times), 'turns_per_sec': len(times) / total,
+               'p50_ms': rgprofile.percentile(times, 50) * 1e3,
+               'p99_ms': rgprofile.percentile(times, 99) * 1e3,
+               'max_ms': times[-1] * 1e3}
+    if hasattr(module, 'memo_stats'):
+        results['memo'] = dict(
+            (name, {'hits': hits, 'misses': misses})
+            for name, (hits, misses) in module.memo_stats().items())
+    return results
+
+
+def bench_run_match(bot, enemy, games, seed):
+    """Times games calls of run_match() in this process, after a first one
+    that loads the map and the bots. Returns the games per second."""
+    seeds = rgtuner.match_seeds(games + 1, seed)
+    rgtuner.run_match(bot, enemy, seeds[0])
+    start = timeit.default_timer()
+    for game_seed in seeds[1:]:
+        rgtuner.run_match(bot, enemy, game_seed)
+    elapsed = timeit.default_timer() - start
+    return {'games': games, 'seconds': elapsed,
+            'games_per_sec': games / elapsed}
+
+
+def bench_versus(bot, enemy, matches, processes, seed):
+    """Times a versus() of matches games with a fresh pool of processes,
+    including starting the pool. Returns the pairings per minute."""
+    start = timeit.default_timer()
+    pool = rgtuner.make_pool(processes, bot.robot_file, [enemy])
+    rgtuner.versus(matches, bot, enemy, pool, seed)
+    pool.close()
+    pool.join()
+    elapsed = timeit.default_timer() - start
+    return {'processes': processes, 'matches': matches, 'seconds': elapsed,
+            'pairings_per_min': 60 / elapsed,
+            'games_per_sec': matches / elapsed}
+
+
+def git_commit():
+    """Returns the commit of the working tree, or None outside of git."""
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                           stderr=devnull).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark a bot's turns and the tuner's matches.")
+    parser.add_argument(
+        "file", type=str, help='The file of the robot to benchmark.')
+    parser.add_argument(
+        "enemy", type=str,
+        help='The file of the enemy to play matches against.')
+    parser.add_argument(
+        "-s", "--seed",
+        default=0,
+        type=int, help='The seed of the game states and matches')
+    parser.add_argument(
+        "-t", "--turns",
+        default=200,
+        type=int, help='The number of game states to time act() on')
+    parser.add_argument(
+        "-g", "--games",
+        default=10,
+        type=int, help='The number of matches to time run_match() on')
+    parser.add_argument(
+        "-m", "--matches",
+        default=20,
+        type=int, help='The number of matches of each timed versus()')
+    parser.add_argument(
+        "-p", "--processes",
+        default='1,%d' % multiprocessing.cpu_count(),
+        type=str, help='A comma-separated list of the numbers of processes '
+                       'to time versus() with')
+    parser.add_argument(
+        "-o", "--output",
+        default='bench.json',
+        type=str, help='The file to write the results to, as JSON')
+    args = vars(parser.parse_args())
+    bot = Variant(args['file'], ())
+    enemy = Variant(args['enemy'], ())
+
+    # the map is loaded along with the first Runner
+    rgtuner.get_runner(bot, enemy)
+    results = {'file': args['file'], 'enemy': args['enemy'],
+               'seed': args['seed'], 'commit': git_commit(),
+               'python': platform.python_version()}
+    results['act'] = bench_act(bot, make_states(args['turns'], args['seed']))
+    print('act(): %(turns_per_sec).1f turns/sec, p50 %(p50_ms).2f ms, '
+          'p99 %(p99_ms).2f ms, max %(max_ms).2f ms' % results['act'])
+    for name, memo in sorted(results['act'].get('memo', {}).items()):
+        print('  %s: %d hits, %d misses' % (name, memo['hits'],
+                                           memo['misses']))
+    results['run_match'] = bench_run_match(bot, enemy, args['games'],
+                                           args['seed'])
+    print('run_match(): %(games_per_sec).2f games/sec' % results['run_match'])
+    results['versus'] = []
+    for processes in args['processes'].split(','):
+        result = bench_versus(bot, enemy, args['matches'], int(processes),
+                              args['seed'])
+        print('versus() with %(processes)d processes: '
+              '%(pairings_per_min).2f pairings/min, '
+              '%(games_per_sec).2f games/sec' % result)
+        results['versus'].append(result)
+    with open(args['output'], 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
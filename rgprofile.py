@@ -0,0 +1,244 @@
+#!/usr/bin/env python2
+from __future__ import print_function
+import collections
+import json
+import time
+import timeit
+import types
+
+# what rgtuner.py reports about the matches it plays: the timings of the bots'
+# functions and turns of --profile, and the events and status lines of
+# --events and --status
+
+# the number of slowest turns and hottest functions a --profile report lists
+PROFILE_TOP = 10
+
+
+class BotProfile(object):
+    """Timings of the functions of the bots and of their turns, collected by
+    rgtuner.profile_job() in the workers and added up by play_pairings().
+    Function times include the time spent in the functions they call."""
+
+    def __init__(self):
+        self.calls = collections.Counter()
+        self.times = collections.Counter()
+        # the time the bots of each robot file spent in Robot.act() on each
+        # of their turns
+        self.turn_times = {}
+        # the slowest turns, as (seconds, bot, seed, turn), slowest first
+        self.worst = []
+
+    def add_turns(self, bot, seed, turns):
+        """Adds the {turn: seconds} act() times of one game of the robot file
+        bot."""
+        self.turn_times.setdefault(bot, []).extend(turns.values())
+        self.worst.extend((t, bot, seed, turn) for turn, t in turns.items())
+        self.worst = sorted(self.worst, reverse=True)[:PROFILE_TOP]
+
+    def merge(self, other):
+        self.calls.update(other.calls)
+        self.times.update(other.times)
+        for bot, times in other.turn_times.items():
+            self.turn_times.setdefault(bot, []).extend(times)
+        self.worst = sorted(self.worst + other.worst,
+                            reverse=True)[:PROFILE_TOP]
+
+    def report(self):
+        """Prints the hottest functions, the act() latency of each bot per
+        turn and the slowest turns."""
+        print('%-50s %10s %10s %10s' % ('function', 'calls', 'total s',
+                                        'us/call'))
+        for name, t in self.times.most_common(PROFILE_TOP):
+            print('%-50s %10d %10.3f %10.1f' % (name, self.calls[name], t,
+                                                t / self.calls[name] * 1e6))
+        for bot, times in sorted(self.turn_times.items()):
+            times = sorted(times)
+            print('%s: %d turns, act() per turn p50 %.2f ms, p99 %.2f ms, '
+                  'max %.2f ms' % (bot, len(times), percentile(times, 50) *
+                                   1e3, percentile(times, 99) * 1e3,
+                                   times[-1] * 1e3))
+        for t, bot, seed, turn in self.worst:
+            print('slow turn: %.2f ms by %s on turn %d of seed %d' %
+                  (t * 1e3, bot, turn, seed))
+
+
+def percentile(values, p):
+    """Returns the p-th percentile of the sorted list values."""
+    return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+
+# the profile of the match profile_match() is playing in this process
+_match_profile = None
+
+
+def timed(name, func):
+    """Returns func, adding up its calls and time in the profile of the match
+    being played, if there is one."""
+    def timed_func(*args, **kwargs):
+        if _match_profile is None:
+            return func(*args, **kwargs)
+        start = timeit.default_timer()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _match_profile.calls[name] += 1
+            _match_profile.times[name] += timeit.default_timer() - start
+    timed_func.__name__ = func.__name__
+    timed_func.__doc__ = func.__doc__
+    return timed_func
+
+
+def timed_act(name, act, turns):
+    """Returns Robot.act timed like timed() does, which also adds the time of
+    each call to the turn it was made on in turns."""
+    timed_func = timed(name, act)
+
+    def timed_act(self, game):
+        start = timeit.default_timer()
+        try:
+            return timed_func(self, game)
+        finally:
+            if _match_profile is not None:
+                turns[game['turn']] = turns.get(game['turn'], 0) + \
+                        timeit.default_timer() - start
+    return timed_act
+
+
+def profile_bot(module):
+    """Times the functions of a bot module and the methods of its classes,
+    once. Returns the {turn: seconds} dict its Robot.act() times go in."""
+    if not hasattr(module, '_rgtuner_turns'):
+        module._rgtuner_turns = {}
+        for name, value in list(module.__dict__.items()):
+            if isinstance(value, types.FunctionType) and \
+                    value.__globals__ is module.__dict__:
+                setattr(module, name,
+                        timed('%s.%s' % (module.__name__, name), value))
+            elif isinstance(value, (type, types.ClassType)) and \
+                    value.__module__ == module.__name__:
+                for attr, method in list(value.__dict__.items()):
+                    if not isinstance(method, types.FunctionType):
+                        continue
+                    label = '%s.%s.%s' % (module.__name__, name, attr)
+                    if attr == 'act':
+                        method = timed_act(label, method,
+                                           module._rgtuner_turns)
+                    else:
+                        method = timed(label, method)
+                    setattr(value, attr, method)
+    return module._rgtuner_turns
+
+
+def profile_match(func, *args):
+    """Calls func(*args), adding up the calls of the functions timed by
+    profile_bot() in a fresh BotProfile. Returns func's result and the
+    profile."""
+    global _match_profile
+    _match_profile = BotProfile()
+    try:
+        result = func(*args)
+    finally:
+        profile, _match_profile = _match_profile, None
+    return result, profile
+
+
+class Metrics(object):
+    """The progress of the matches played by rgtuner.play_pairings().
+    Every game, failed match, decided comparison and status is written as a
+    line of JSON to the events file, if there is one, and a status line is
+    printed every interval seconds, if given."""
+
+    def __init__(self, path=None, interval=None):
+        self.events = None
+        if path is not None:
+            self.events = open(path, 'a')
+        self.interval = interval
+        self.start = self.last_status = time.time()
+        self.games = 0
+        # the matches that timed out or crashed, and the times no match came
+        # back in time, by 'timeout', 'crash' and 'stall'
+        self.failures = collections.Counter()
+        self.worker_games = collections.Counter()
+        # the matches handed to the pool that haven't come back yet
+        self.queued = 0
+        # the comparisons being played, by (bot1, bot2)
+        self.comparisons = {}
+        # the workers that played a game since the last status
+        self.recent_workers = set()
+
+    def event(self, kind, **fields):
+        if self.events is not None:
+            fields['event'] = kind
+            fields['time'] = time.time()
+            self.events.write(json.dumps(fields) + '\n')
+            self.events.flush()
+
+    def submitted(self, comparisons, jobs):
+        self.comparisons = comparisons
+        self.queued += jobs
+
+    def game(self, comparison, index, result, worker):
+        self.games += 1
+        self.queued -= 1
+        self.worker_games[worker] += 1
+        self.recent_workers.add(worker)
+        self.event('game', bot1=str(comparison.bot1),
+                   bot2=str(comparison.bot2), index=index,
+                   scores=list(result[:2]), worker=worker)
+        if self.interval is not None and \
+                time.time() - self.last_status >= self.interval:
+            self.status()
+
+    def failed(self, comparison, index, outcome, worker, recorded):
+        self.failures[outcome] += 1
+        self.queued -= 1
+        self.event('failed', bot1=str(comparison.bot1),
+                   bot2=str(comparison.bot2), index=index, outcome=outcome,
+                   worker=worker, recorded=recorded)
+
+    def stalled(self, lost):
+        self.failures['stall'] += 1
+        self.queued -= lost
+        self.event('stall', lost=lost)
+
+    def decided(self, comparison, winScore):
+        mean, ci = comparison.mean_difference()
+        self.event('decided', bot1=str(comparison.bot1),
+                   bot2=str(comparison.bot2), played=comparison.played,
+                   score=winScore, mean=mean, ci=ci)
+
+    def status(self):
+        """Prints and logs the games played so far, how fast they are being
+        played, and where each comparison being played stands."""
+        self.last_status = time.time()
+        elapsed = max(self.last_status - self.start, 1e-9)
+        rate = self.games / elapsed
+        workers = max(len(self.recent_workers), 1)
+        self.recent_workers = set()
+        eta = self.queued / rate if rate else None
+        candidates = []
+        for c in self.comparisons.values():
+            mean, ci = c.mean_difference()
+            candidates.append({'bot1': str(c.bot1), 'bot2': str(c.bot2),
+                               'played': c.played, 'mean': mean, 'ci': ci})
+        self.event('status', games=self.games, games_per_sec=rate,
+                   worker_games_per_sec=dict(
+                       (w, n / elapsed) for w, n in self.worker_games.items()),
+                   queued=self.queued, failures=dict(self.failures), eta=eta,
+                   candidates=candidates)
+        print('STATUS %d games, %.2f games/sec, %.2f per worker (%d), '
+              '%d queued, %d timeouts, %d crashes, %d stalls, eta %s' %
+              (self.games, rate, rate / workers, workers, self.queued,
+               self.failures['timeout'], self.failures['crash'],
+               self.failures['stall'], '?' if eta is None else '%ds' % eta))
+        for candidate in sorted(candidates, key=lambda c: c['bot1']):
+            ci = candidate['ci']
+            print('STATUS  %s vs %s: %+.2f +- %s per game after %d' %
+                  (candidate['bot1'], candidate['bot2'], candidate['mean'],
+                   '?' if ci is None else '%.2f' % ci, candidate['played']))
+
+    def close(self):
+        if self.interval is not None:
+            self.status()
+        if self.events is not None:
+            self.events.close()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python2
+from __future__ import print_function
+import argparse
+import multiprocessing
+import rgtuner
+from rgtuner import Variant
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rank robots by rating them against each other.")
+    parser.add_argument(
+        "bots", type=str,
+        help='A comma-separated list of the files of the robots to rank.')
+    parser.add_argument(
+        "-v", "--variants",
+        default=None,
+        type=str, help='Rank variants of the first robot instead, given as '
+                       'CONSTANT=value,value,...; the other robots are then '
+                       'the enemies they are rated against as well')
+    parser.add_argument(
+        "-m", "--matches",
+        default=100,
+        type=int, help='The most matches to play per robot ranked')
+    parser.add_argument(
+        "-p", "--processes",
+        default=multiprocessing.cpu_count(),
+        type=int, help='The number of processes to simulate in')
+    parser.add_argument(
+        "-s", "--seed",
+        default=None,
+        type=int, help='Play the matches on seeds derived from this one')
+    args = vars(parser.parse_args())
+    files = args['bots'].split(',')
+    enemies = []
+    if args['variants'] is None:
+        bots = [Variant(f, ()) for f in files]
+    else:
+        variable, values = args['variants'].split('=', 1)
+        bots = rgtuner.make_variants(variable, files[0],
+                                     [float(v) for v in values.split(',')])
+        enemies = [Variant(f, ()) for f in files[1:]]
+    if len(set(bots + enemies)) < 2:
+        parser.error('at least two robots are needed to rank them')
+    pool = rgtuner.make_pool(args['processes'], files[0], enemies)
+    rgtuner.run_rating_tourney(args['matches'], enemies, bots, pool,
+                               rgtuner.TuneOptions(seed=args['seed']))
+    pool.close()
+    pool.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python2
+from __future__ import print_function
+import itertools
+import threading
+import traceback
+from multiprocessing.managers import BaseManager
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+# the job server of rgtuner.py --listen, which hands the matches of a tuning
+# run to rgworker.py processes on this or other machines
+
+# the job server's queues, shared with rgworker.py processes by JobManager
+_jobs = queue.Queue()
+_results = queue.Queue()
+# the numbers of the imap_unordered() calls of every RemotePool, so that the
+# results of one are never taken for another's
+_batches = itertools.count(1)
+
+# the seconds a worker waits for a job before asking again. The server waits
+# on behalf of the worker, and would hand the next job to a worker that has
+# gone away if it waited for good
+JOB_POLL = 1
+
+
+def get_jobs():
+    return _jobs
+
+
+def get_results():
+    return _results
+
+
+class JobManager(BaseManager):
+    """Shares the job and result queues of a tuning run over a socket."""
+JobManager.register('get_jobs', callable=get_jobs)
+JobManager.register('get_results', callable=get_results)
+
+
+def parse_address(address):
+    """Turns 'host:port' into a (host, port) tuple."""
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+def serve_jobs(address, authkey):
+    """Starts serving the job queues at address ('host:port') in a background
+    thread, for rgworker.py processes on this or other machines to play the
+    matches of a RemotePool.
+    Jobs and results are pickled, so anyone connecting with authkey can run
+    code on this process and on the workers."""
+    manager = JobManager(address=parse_address(address),
+                         authkey=authkey.encode())
+    server = manager.get_server()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+
+class RemotePool(object):
+    """Stands in for a multiprocessing.Pool in play_pairings(), handing the
+    jobs to rgworker.py processes through the queues of serve_jobs().
+    The source of every bot travels with its job, so workers don't need a
+    copy of the bot files."""
+
+    def __init__(self, processes):
+        # the number of worker processes expected, read by pool_size()
+        self._processes = processes
+        self._batch = None
+
+    def imap_unordered(self, func, jobs):
+        self._batch = next(_batches)
+        sources = {}
+        for job in jobs:
+            job_sources = {}
+            # the bots of the job, which are rgtuner Variants
+            for arg in job:
+                if hasattr(arg, 'robot_file'):
+                    if arg.robot_file not in sources:
+                        with open(arg.robot_file, 'r') as f:
+                            sources[arg.robot_file] = f.read()
+                    job_sources[arg.robot_file] = sources[arg.robot_file]
+            _jobs.put((self._batch, func.__name__, job, job_sources))
+        return RemoteResults(self._batch)
+
+    def terminate(self):
+        while True:
+            try:
+                _jobs.get_nowait()
+            except queue.Empty:
+                break
+
+    def close(self):
+        pass
+
+    def join(self):
+        pass
+
+
+class RemoteResults(object):
+    """The results of one RemotePool.imap_unordered() call."""
+
+    def __init__(self, batch):
+        self._batch = batch
+
+    def next(self, timeout=None):
+        while True:
+            batch, result, error = _results.get(timeout=timeout)
+            # results of jobs abandoned by an earlier call are dropped
+            if batch != self._batch:
+                continue
+            if error is not None:
+                raise RuntimeError('remote job failed:\n' + error)
+            return result
+
+
+def work(address, authkey, play, matches=None):
+    """Plays the jobs of the job server at address ('host:port') until it
+    goes away, or until it has played matches of them, if given, by calling
+    play(func_name, job, sources) with the name of the function the job was
+    handed out with and the sources of its bot files.
+    This is what rgworker.py runs in each of its processes."""
+    manager = JobManager(address=parse_address(address),
+                         authkey=authkey.encode())
+    manager.connect()
+    jobs = manager.get_jobs()
+    results = manager.get_results()
+    played = 0
+    while matches is None or played < matches:
+        try:
+            batch, func_name, job, sources = jobs.get(timeout=JOB_POLL)
+        except queue.Empty:
+            continue
+        # the matches of the job
+        played += len(job[1])
+        try:
+            results.put((batch, play(func_name, job, sources), None))
+        except Exception:
+            results.put((batch, None, traceback.format_exc()))
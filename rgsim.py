@@ -0,0 +1,227 @@
+#!/usr/bin/env python2
+from __future__ import print_function
+import ast
+import collections
+import random
+import rgkit.rg
+from rgkit.run import Options
+from rgkit.settings import settings
+
+# the robotgame rules without rgkit's Runner: the tuner only needs the final
+# scores of a game, so this skips rgkit's option handling, player sandboxing,
+# history and rendering, and plays the bots in-process on plain dicts.
+# it seeds its random streams the way rgkit's GameState does, but the robots
+# act, and draw their attack damage, in order of location rather than in
+# rgkit's dict order, so the same seed need not give the same game as rgkit.
+# tests/test_rgsim.py's HistoryTest compares whole games against rgkit, and
+# rgtuner.verify_simulator() compares scores before the tuner relies on it
+
+
+class RobotInfo(dict):
+    """A robot as the bots see it, which like rgkit's can be read as a dict or
+    through attributes."""
+    __getattr__ = dict.__getitem__
+
+
+def load_map(map_filepath=None):
+    """Loads rgkit's default map, or the one at map_filepath, into settings,
+    as rgkit's Runner does."""
+    if map_filepath is None:
+        map_filepath = Options().map_filepath
+    with open(map_filepath) as f:
+        settings.init_map(ast.literal_eval(f.read()))
+
+
+class Game(object):
+    """One game between the Robot instances of two players."""
+
+    def __init__(self, robots, seed, record_history=False):
+        self.players = robots
+        seed = str(seed)
+        self.spawn_random = random.Random(seed + 's')
+        self.attack_random = random.Random(seed + 'a')
+        self.turn = 0
+        self.next_robot_id = 0
+        # the robots on the board, by location
+        self.robots = {}
+        # the robots on the board at the start of each turn and at the end,
+        # if record_history
+        self.history = [{}] if record_history else None
+        self.around = dict(
+            (loc, rgkit.rg.locs_around(loc, filter_out=('invalid',
+                                                        'obstacle')))
+            for loc in self.board())
+
+    def board(self):
+        return [(x, y) for x in xrange(settings.board_size)
+                for y in xrange(settings.board_size)]
+
+    def spawn_locations(self):
+        """Returns the squares the robots of each player spawn on this turn,
+        picked symmetrically like rgkit does."""
+        size = settings.board_size
+        locs1 = []
+        locs2 = []
+        while len(locs1) < settings.spawn_per_player:
+            loc = self.spawn_random.choice(settings.spawn_coords)
+            sloc = (size - 1 - loc[0], size - 1 - loc[1])
+            if loc not in locs1 and loc not in locs2 and \
+                    sloc not in locs1 and sloc not in locs2:
+                locs1.append(loc)
+                locs2.append(sloc)
+        return locs1 + locs2
+
+    def get_actions(self):
+        """Returns the action of every robot on the board, by location.
+        Invalid actions and errors in act() are taken as guarding."""
+        actions = {}
+        for player_id, player in enumerate(self.players):
+            game = {'turn': self.turn, 'robots': dict(
+                (loc, RobotInfo(location=loc, hp=robot['hp'],
+                                player_id=robot['player_id'],
+                                **({'robot_id': robot['robot_id']}
+                                   if robot['player_id'] == player_id else {})))
+                for loc, robot in sorted(self.robots.items()))}
+            for loc, robot in sorted(self.robots.items()):
+                if robot['player_id'] != player_id:
+                    continue
+                player.location = loc
+                player.hp = robot['hp']
+                player.player_id = player_id
+                player.robot_id = robot['robot_id']
+                try:
+                    action = player.act(game)
+                except Exception:
+                    action = ['guard']
+                actions[loc] = self.validate(loc, action)
+        return actions
+
+    def validate(self, loc, action):
+        try:
+            if action[0] in ('move', 'attack'):
+                if tuple(action[1]) in self.around[loc]:
+                    return (action[0], tuple(action[1]))
+            elif action[0] in ('guard', 'suicide'):
+                return (action[0],)
+        except (TypeError, IndexError, KeyError):
+            pass
+        return ('guard',)
+
+    def run_turn(self):
+        actions = self.get_actions()
+
+        def dest(loc):
+            if actions[loc][0] == 'move':
+                return actions[loc][1]
+            return loc
+
+        # the robots that end the turn on each square, or try to
+        hitpoints = collections.defaultdict(set)
+        for loc in self.robots:
+            hitpoints[dest(loc)].add(loc)
+
+        def stuck(loc):
+            # the robot at loc stays there, and so do those trying to move in
+            old = hitpoints[loc]
+            hitpoints[loc] = set([loc])
+            for other in old:
+                if other != loc:
+                    stuck(other)
+
+        for loc in self.robots:
+            to = dest(loc)
+            if len(hitpoints[to]) > 1 or (to != loc and to in self.robots and
+                                         dest(to) == loc):
+                stuck(loc)
+
+        # the robots still contending for a square were all stuck, and are on
+        # their own squares too
+        ends = {}
+        for end, locs in hitpoints.items():
+            if len(locs) == 1:
+                for loc in locs:
+                    ends[loc] = end
+
+        # the robots each robot that failed to move bumped into: those that
+        # ended up on the square it was moving to, or tried to move there too
+        collided = collections.defaultdict(set)
+        for loc in self.robots:
+            to = dest(loc)
+            if to == loc or ends[loc] != loc:
+                continue
+            for other in self.robots:
+                if other != loc and (ends[other] == to or dest(other) == to):
+                    collided[loc].add(other)
+                    collided[other].add(loc)
+
+        # the damage dealt on each square by each player
+        damage = collections.defaultdict(
+            lambda: [0] * settings.player_count)
+        hp = {}
+        for loc, robot in sorted(self.robots.items()):
+            hp[loc] = robot['hp']
+            action = actions[loc]
+            if action[0] == 'attack':
+                damage[action[1]][robot['player_id']] += \
+                        self.attack_random.randint(*settings.attack_range)
+            elif action[0] == 'suicide':
+                hp[loc] = 0
+                for target in rgkit.rg.locs_around(loc):
+                    damage[target][robot['player_id']] += \
+                            settings.suicide_damage
+
+        robots = {}
+        for loc, robot in self.robots.items():
+            end = ends[loc]
+            guarding = actions[loc][0] == 'guard'
+            taken = sum(d for player_id, d in enumerate(damage[end])
+                        if player_id != robot['player_id'])
+            if guarding:
+                taken //= 2
+            else:
+                taken += settings.collision_damage * sum(
+                    1 for other in collided[loc]
+                    if self.robots[other]['player_id'] != robot['player_id'])
+            robot_hp = hp[loc] - taken
+            if robot_hp > 0:
+                robots[end] = {'hp': robot_hp,
+                               'player_id': robot['player_id'],
+                               'robot_id': robot['robot_id']}
+
+        if self.turn % settings.spawn_every == 0:
+            for loc in settings.spawn_coords:
+                robots.pop(loc, None)
+            locations = self.spawn_locations()
+            for i in xrange(settings.spawn_per_player):
+                for player_id in xrange(settings.player_count):
+                    loc = locations[player_id * settings.spawn_per_player + i]
+                    robots[loc] = {'hp': settings.robot_hp,
+                                   'player_id': player_id,
+                                   'robot_id': self.next_robot_id}
+                    self.next_robot_id += 1
+        self.robots = robots
+        self.turn += 1
+        if self.history is not None:
+            self.history.append(dict(robots))
+
+    def run(self):
+        """Plays the game out and returns the scores of the players."""
+        while self.turn < settings.max_turns:
+            self.run_turn()
+        scores = [0] * settings.player_count
+        for robot in self.robots.values():
+            scores[robot['player_id']] += 1
+        return tuple(scores)
+
+
+class Runner(object):
+    """Stands in for rgkit's Runner in rgtuner.get_runner(), playing one game
+    of the Robot instances of two players per run()."""
+
+    def __init__(self, robots, options=None):
+        self.robots = robots
+        self.options = options or Options()
+        load_map(self.options.map_filepath)
+
+    def run(self):
+        return [Game(self.robots, self.options.game_seed).run()]
@@ -1,79 +1,434 @@
 #!/usr/bin/env python2
 from __future__ import print_function
 import os
+import sys
 import multiprocessing
 import re
-import shutil
 import argparse
-filesRemaining = []
-botScores = {}
+import ast
+import binascii
+import collections
+import copy
+import hashlib
+import json
+import math
+import numbers
+import socket
+import sqlite3
+import traceback
+import types
 import random
+import signal
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+import rgkit.rg
+from rgkit.game import Player
 from rgkit.run import Runner, Options
 from rgkit.settings import settings as default_settings
+import rgprofile
+import rgremote
+import rgsim
+
+# bots are loaded by the tuner rather than by rgkit, so make sure their
+# `import rg` finds rgkit's helpers
+sys.modules.setdefault('rg', rgkit.rg)
+# results from rgworker.py processes refer to rgtuner's Variants, which must be
+# found in this module when it is run as a script
+sys.modules.setdefault('rgtuner', sys.modules[__name__])
+
+# seed stored in the result cache for matches played on random seeds
+UNSEEDED = -1
+
+# gain sequence exponents of the SPSA optimizer, as recommended by Spall
+SPSA_ALPHA = 0.602
+SPSA_GAMMA = 0.101
+
+# the surrogate optimizer: the fewest values its first round plays, the number
+# of values along the range it may play next that it weighs, and the expected
+# improvement of the mean score difference per game below which it stops
+SURROGATE_START = 5
+SURROGATE_GRID = 200
+SURROGATE_MIN_IMPROVEMENT = 0.05
+
+# the win rate of the stronger bot that the sequential test of versus() tells
+# apart from the same win rate of the weaker one
+SPRT_WIN_RATE = 0.6
+
+# the seconds a worker lets a match run before giving up on it, and the times a
+# match that timed out or crashed is played before it is recorded as such
+MATCH_TIMEOUT = 60
+MATCH_ATTEMPTS = 3
+# the number of matches a worker process plays before it is replaced by a
+# fresh one, to free whatever the bots and rgkit piled up; None for no limit.
+# rgworker.py counts the matches themselves, but the processes of the local
+# pool can only count jobs, so they are replaced after
+# WORKER_MATCHES // MATCH_BATCH jobs, which is fewer matches than
+# WORKER_MATCHES when the jobs are smaller than MATCH_BATCH
+WORKER_MATCHES = 1000
+# the most matches of one pairing a worker plays per job, back to back, so
+# that each match doesn't pay for its own trip through the pool's queues
+MATCH_BATCH = 10
+
+# Glicko ratings of run_rating_tourney(): the rating and rating deviation bots
+# start at, the deviation below which a bot's rating is taken as settled, and
+# the number of games of each encounter between two bots
+RATING_START = 1500.0
+RATING_DEVIATION = 350.0
+RATING_SETTLED = 50.0
+RATING_GAMES = 2
+
+# the standard errors by which the paired difference of a candidate over the
+# base must be above 0 for run_paired_tourney() to pick it
+PAIRED_ERRORS = 1.0
+
+# the share of its weight an enemy of an EnemyPool keeps however little it tells
+# the candidates apart, so that it can earn the rest back
+SAMPLE_FLOOR = 0.2
+
+# whether matches are played by rgsim rather than rgkit's Runner, and the
+# number of seeds per enemy verify_simulator() plays both ways before it is
+SIMULATE = False
+SIMULATOR_CHECKS = 5
+
+
+class ResultCache(object):
+    """Persistent store of versus() results, shared across runs.
+
+    Results are keyed by a hash of each bot's source, the seed the matches were
+    played from and the number of matches, so a renamed variant or a value that
+    was already tried for another variable is never replayed. The results of
+    paired comparisons keep their score difference per seed alongside, for
+    run_paired_tourney()."""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'bot TEXT, enemy TEXT, seed INTEGER, matches INTEGER, '
+            'score INTEGER, PRIMARY KEY (bot, enemy, seed, matches))')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS seed_diffs ('
+            'bot TEXT, enemy TEXT, seed INTEGER, matches INTEGER, '
+            'diffs TEXT, PRIMARY KEY (bot, enemy, seed, matches))')
+        self._conn.commit()
+
+    def get(self, bot, enemy, seed, matchNum, paired=False):
+        """Returns the stored score of bot against enemy, or None."""
+        row = self._conn.execute(
+            'SELECT score FROM results WHERE bot = ? AND enemy = ? '
+            'AND seed = ? AND matches = ?',
+            (cache_key(bot, paired), bot_hash(enemy), cache_seed(seed),
+             matchNum)).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def get_diffs(self, bot, enemy, seed, matchNum):
+        """Returns the stored seed_diffs() of the paired comparison of bot
+        against enemy, or None."""
+        row = self._conn.execute(
+            'SELECT diffs FROM seed_diffs WHERE bot = ? AND enemy = ? '
+            'AND seed = ? AND matches = ?',
+            (cache_key(bot, True), bot_hash(enemy), cache_seed(seed),
+             matchNum)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def put(self, bot, enemy, seed, matchNum, score, paired=False,
+            diffs=None):
+        key = (cache_key(bot, paired), bot_hash(enemy), cache_seed(seed),
+               matchNum)
+        self._conn.execute(
+            'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+            key + (score,))
+        if diffs is not None:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO seed_diffs VALUES (?, ?, ?, ?, ?)',
+                key + (json.dumps(diffs),))
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+def bot_hash(bot):
+    """Returns a hex digest of the source of a Variant as it is played: its
+    robot file and the overrides that change it. An override of a constant to
+    the value the file assigns it changes nothing, so the base bot of every
+    variable, with or without its own value as an override, hashes like the
+    plain file. That is only known of a constant the file assigns once:
+    load_bot() sets the overrides after the module has run, so an override
+    of a name the file assigns again, or declares global, always counts."""
+    with open(bot.robot_file, 'rb') as f:
+        digest = hashlib.sha1(f.read())
+    constants = numeric_constants(bot.robot_file)
+    tree = parse_bot(bot.robot_file)
+    stores = collections.Counter()
+    declared = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            stores[node.id] += 1
+        elif isinstance(node, ast.Global):
+            declared.update(node.names)
+    overrides = tuple(sorted(
+        (variable, value) for variable, value in bot.overrides
+        if variable not in constants or stores[variable] > 1 or
+        variable in declared or
+        literal_number(tree.body[constants[variable]].value) != value))
+    digest.update(repr(overrides).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def cache_key(bot, paired):
+    """Returns the key of bot in the cache. Paired comparisons play both
+    player orders, and rgsim is only checked against rgkit on a few seeds,
+    so the results of each are kept apart from the others."""
+    key = bot_hash(bot)
+    if paired:
+        key += '/paired'
+    if SIMULATE:
+        key += '/rgsim'
+    return key
+
+
+def cache_seed(seed):
+    if seed is None:
+        return UNSEEDED
+    return seed
+
+
+class Variant(collections.namedtuple('Variant', 'robot_file overrides')):
+    """A robot file with some of its module-level constants overridden.
+    overrides is a tuple of (constant, value) pairs; a plain bot file is a
+    Variant with no overrides."""
+    __slots__ = ()
+
+    def __str__(self):
+        if not self.overrides:
+            return self.robot_file
+        return ','.join('%s%s' % o for o in self.overrides)
+
+
 def make_variants(variable, robot_file, possibilities):
     """Makes variants of the file robot_file  with the constant variable
     changed for each possibility.
 
     e.g. if the variable is "ELEPHANTS" and the possibilities are [1, 2, 3],
-    this will find the line
-    ELEPHANTS = 3
-    in robobt_file and make a copy of the file for each value in possibilities.
-    1.py will have ELEPHANTS = 1, 2.py will have ELEPHANTS = 2, etc.
-
-    Raises IndexError if the variable name is not found in the file robot_file.
-    The line assigning the constant variable must be the first line in that
-    file has the variable name in it.
+    this will return a Variant of robot_file for each value in possibilities:
+    the first will have ELEPHANTS = 1, the second ELEPHANTS = 2, etc.
+    No files are written; the values are put in place of the constant's in
+    the parsed file when a worker compiles the variant.
     """
-    filenames = []
+    return [Variant(robot_file, ((variable, p),)) for p in possibilities]
+
+
+def literal_number(node):
+    """Returns the number the expression node is a literal of, like 2.5 or
+    -1, or None if it isn't one."""
+    try:
+        value = ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError):
+        return None
+    if isinstance(value, bool) or not isinstance(value, numbers.Real):
+        return None
+    return value
+
+
+def numeric_constants(robot_file):
+    """Returns the index in the parsed module of robot_file of every
+    module-level assignment of a number to a single name, by name, in the
+    order they are assigned. Only the first assignment of a name counts."""
+    constants = collections.OrderedDict()
+    for i, node in enumerate(parse_bot(robot_file).body):
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and \
+                isinstance(node.targets[0], ast.Name) and \
+                node.targets[0].id not in constants and \
+                literal_number(node.value) is not None:
+            constants[node.targets[0].id] = i
+    return constants
+
+
+def constant_assignment(variable, robot_file):
+    """Returns the module-level assignment of the constant variable in
+    robot_file. Raises NameError if there is none."""
+    constants = numeric_constants(robot_file)
+    if variable not in constants:
+        raise NameError('%s is not a numeric constant of %s' %
+                        (variable, robot_file))
+    return parse_bot(robot_file).body[constants[variable]]
+
+
+def write_value(variable, robot_file, value):
+    """Rewrites the line assigning the constant variable in robot_file so that
+    it assigns value instead, keeping any comment at the end of it.
+    The assignment must be on a line of its own."""
+    line_number = constant_assignment(variable, robot_file).lineno - 1
     with open(robot_file, 'r') as f:
         lines = f.readlines()
-       
-        for i, line in enumerate(lines):
-          if variable in line:
-            break
-        assert '=' in line
-        for p in possibilities:
-            varandp = variable + str(p)
-            lines[i] = "%s = %s\n" % (variable, p)
-            filenames.append(varandp)
-            with open(varandp, 'w') as pfile:
-                for line in lines:
-                    pfile.write(line)
-
-    return filenames
+    line = lines[line_number]
+    try:
+        statements = ast.parse(line.strip()).body
+    except SyntaxError:
+        raise ValueError('the assignment of %s in %s spans several lines' %
+                         (variable, robot_file))
+    if len(statements) != 1:
+        raise ValueError('the assignment of %s in %s shares its line with '
+                         'other statements' % (variable, robot_file))
+    comment = re.search(r'\s*#.*$', line.rstrip('\n'))
+    lines[line_number] = "%s = %s%s\n" % (
+        variable, value, comment.group(0) if comment else '')
+    with open(robot_file, 'w') as f:
+        f.writelines(lines)
+    forget_file(robot_file)
 
 
 def get_current_value(variable, robot_file):
     """
-    Returns the value of the constant variable in the robot file.
-
-    This function finds the first line in the file robot_file that has the
-    variable name in it, and parses the value after the '=' in that line for a
-    float, returning it.
+    Returns the value of the constant variable in the robot file, as a
+    float.
 
-    Raises IndexError if the variable name is not found in the file robot_file.
-    The line assigning the constant variable must be the first line in that
-    file has the variable name in it.
+    The constant must be assigned a number at the module level of the file;
+    see numeric_constants(). Raises NameError if it isn't.
     """
-    with open(robot_file, 'r') as f:
-        for i, line in enumerate(f):
-          if variable in line:
-            break
-        assert '=' in line
-    return float(line[line.index('=') + 1:])
+    assignment = constant_assignment(variable, robot_file)
+    return float(literal_number(assignment.value))
+
+
+def variant_to_json(bot):
+    return [bot.robot_file, [list(o) for o in bot.overrides]]
+
+
+def variant_from_json(data):
+    return Variant(data[0], tuple(tuple(o) for o in data[1]))
+
+
+class Checkpoint(object):
+    """Progress of a tuning run, saved to a JSON file so that an interrupted
+    run can be resumed with --resume.
+
+    state holds the optimizer's own progress (e.g. the base value and the
+    precision) along with 'step', the matches played so far in the current
+    step by play_pairings()."""
+
+    def __init__(self, path, state=None):
+        self.path = path
+        self.state = state or {}
+
+    @staticmethod
+    def load(path):
+        with open(path, 'r') as f:
+            return Checkpoint(path, json.load(f))
+
+    def save(self, **changes):
+        """Updates the state with changes and writes it out atomically."""
+        self.state.update(changes)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f)
+        os.rename(tmp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def checkpoint_path(run):
+    """Returns the default checkpoint file of a run, a dict of the arguments
+    that must be the same to resume it. The robot file is identified by its
+    path rather than its contents, which the run rewrites as it goes."""
+    run = dict(run, file=os.path.abspath(run['file']))
+    digest = hashlib.sha1(json.dumps(run, sort_keys=True).encode('utf-8'))
+    return 'rgtuner_checkpoint_%s.json' % digest.hexdigest()[:12]
+
+
+def find_constants(robot_file):
+    """Returns the names of the tunable constants of robot_file, in the order
+    they are assigned: the upper case names ending in _WEIGHT or _BIAS
+    assigned a float at module level that no function declares global.
+    Integers are left out, as they tend to be sizes and counts that the
+    tuner's float values would break, and so are other names, like
+    exponents, which can break the bot at some values."""
+    tree = parse_bot(robot_file)
+    declared = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Global):
+            declared.update(node.names)
+    return [name for name, i in numeric_constants(robot_file).items()
+            if re.match(r'[A-Z_][A-Z0-9_]*_(WEIGHT|BIAS)$', name)
+            and name not in declared
+            and isinstance(literal_number(tree.body[i].value), float)]
+
+
+class TuneOptions(collections.namedtuple('TuneOptions', [
+        'cache', 'seed', 'confidence', 'tie_retries', 'remote', 'checkpoint',
+        'paired', 'rating', 'sampling', 'profile', 'metrics'])):
+    """How the matches of a tuning run are played and reported, as given on
+    the command line:
+    cache is the ResultCache results are reused from and stored in, if any.
+    seed and confidence are as described in play_pairings(), and tied
+    comparisons of run_tourney() are replayed up to tie_retries times.
+    remote is whether rgworker.py processes play the matches.
+    checkpoint is the Checkpoint the progress is saved to, if any.
+    paired, rating and sampling pick the tourney the greedy optimizer
+    compares candidates with; sampling is the EnemyPool of the enemies,
+    which the other optimizers split their matches between too.
+    profile is the BotProfile every match played is added to, and metrics the
+    Metrics the matches are reported to, if given."""
+    __slots__ = ()
+
+    def __new__(cls, cache=None, seed=None, confidence=None, tie_retries=0,
+                remote=False, checkpoint=None, paired=False, rating=False,
+                sampling=None, profile=None, metrics=None):
+        return super(TuneOptions, cls).__new__(
+            cls, cache, seed, confidence, tie_retries, remote, checkpoint,
+            paired, rating, sampling, profile, metrics)
+
 
+def make_pool(processes, robot_file, enemies, remote=False):
+    """Returns a pool of processes preloaded with robot_file and enemies.
+    If remote is true, the matches are played by rgworker.py processes
+    connected to the job server instead; see serve_jobs()."""
+    if remote:
+        return rgremote.RemotePool(processes)
+    # the pool counts jobs, not matches; see WORKER_MATCHES
+    jobs = None
+    if WORKER_MATCHES:
+        jobs = max(1, WORKER_MATCHES // MATCH_BATCH)
+    return multiprocessing.Pool(processes, initializer=init_worker,
+                                initargs=([Variant(robot_file, ())] + enemies,),
+                                maxtasksperchild=jobs)
 
-def optimize_variable(precisionParam, matchNum, enemies, variable, robot_file, processes):
-    pool = multiprocessing.Pool(processes)
+
+def optimize_variable(precisionParam, matchNum, enemies, variable, robot_file, processes,
+                      options):
     """
     Creates a bunch of variants of the file robot_file, each with variable
     changed, then runs a tournament between the variants to find the best one.
     The file robot_fily is modified to contain the best value, and it is
     returned.
+    options are the TuneOptions of the run. If their checkpoint holds the
+    progress of an interrupted run tuning variable, tuning carries on from
+    there.
+    The variants are compared with run_sampled_tourney() if the options have
+    sampling, with run_rating_tourney() if rating, with run_paired_tourney()
+    if paired and with run_tourney() otherwise.
     """
+    pool = make_pool(processes, robot_file, enemies, options.remote)
     base_value = get_current_value(variable, robot_file)
+    checkpoint = options.checkpoint
 
     precision = precisionParam
+    if checkpoint is not None:
+        if checkpoint.state.get('variable') == variable:
+            base_value = checkpoint.state['base_value']
+            precision = checkpoint.state['precision']
+            print('RESUMING', variable)
+        else:
+            checkpoint.save(variable=variable, base_value=base_value,
+                            precision=precision, step={})
 
     while precision >= 0.1:
         print('RUNNING WITH BASE VALUE', base_value, \
@@ -83,7 +438,17 @@ def optimize_variable(precisionParam, matchNum, enemies, variable, robot_file, p
             base_value + precision, base_value]
 
         files = make_variants(variable, robot_file, values_to_test)
-        best_file = run_tourney(matchNum,enemies, files, pool)
+        if options.sampling is not None:
+            best_file = run_sampled_tourney(matchNum, options.sampling, files,
+                                            pool, options)
+        elif options.rating:
+            best_file = run_rating_tourney(matchNum, enemies, files, pool,
+                                           options)
+        elif options.paired:
+            best_file = run_paired_tourney(matchNum, enemies, files, pool,
+                                           options)
+        else:
+            best_file = run_tourney(matchNum,enemies, files, pool, options)
         best_value = values_to_test[files.index(best_file)]
         if best_value == base_value:
             precision /= 2.0
@@ -92,114 +457,1338 @@ def optimize_variable(precisionParam, matchNum, enemies, variable, robot_file, p
         else:
             base_value = best_value
             print('new \'best\' value is', best_value)
+        if checkpoint is not None:
+            checkpoint.save(base_value=base_value, precision=precision,
+                            step={})
 
-    shutil.copy(make_variants(variable, robot_file, [base_value])[0],
-                robot_file)
+    pool.close()
+    pool.join()
+    write_value(variable, robot_file, base_value)
 
     return base_value
 
-def run_match(bot1, bot2):   
+
+def optimize_variables(precisionParam, matchNum, enemies, variables,
+                       robot_file, processes, iterations, batch, options):
+    """
+    Tunes all of variables together with simultaneous perturbation stochastic
+    approximation (SPSA).
+
+    Each iteration perturbs every variable at once by +-c in batch random
+    directions, plays both sides of each perturbation against the enemies in a
+    single batch, and moves the values along the averaged gradient estimate.
+    c starts at precisionParam and shrinks over the iterations.
+    The file robot_file is modified to contain the tuned values, and a dict of
+    them is returned.
+    options are the TuneOptions of the run. If their checkpoint holds the
+    progress of an interrupted run, tuning carries on from there.
+    If they have sampling, the matches are split between the enemies; see
+    EnemyPool.play().
+    """
+    pool = make_pool(processes, robot_file, enemies, options.remote)
+    values = [get_current_value(v, robot_file) for v in variables]
+    checkpoint = options.checkpoint
+    rng = random.Random(options.seed)
+    gain = None
+    start = 0
+
+    if checkpoint is not None and 'iteration' in checkpoint.state:
+        start = checkpoint.state['iteration']
+        values = checkpoint.state['values']
+        gain = checkpoint.state['gain']
+        version, internal, gauss = checkpoint.state['rng']
+        rng.setstate((version, tuple(internal), gauss))
+        print('RESUMING AT ITERATION', start)
+
+    for k in xrange(start, iterations):
+        if checkpoint is not None:
+            checkpoint.save(iteration=k, values=values, gain=gain,
+                            rng=rng.getstate())
+        c = precisionParam / (k + 1) ** SPSA_GAMMA
+        print('ITERATION', k, 'PERTURBATION', c)
+        print(', '.join('%s = %s' % vx for vx in zip(variables, values)))
+
+        deltas = [[rng.choice((-1, 1)) for v in variables]
+                  for i in xrange(batch)]
+        candidates = []
+        for delta in deltas:
+            for sign in (1, -1):
+                candidates.append(Variant(robot_file, tuple(
+                    (v, round(x + sign * c * d, 3))
+                    for v, x, d in zip(variables, values, delta))))
+        # the gradient is made of the differences between the two sides of
+        # each perturbation
+        rivals = [candidates[i:i + 2] for i in xrange(0, len(candidates), 2)]
+
+        iteration_options = options._replace(
+            seed=None if options.seed is None else options.seed + k)
+        if options.sampling is not None:
+            results = options.sampling.play(matchNum, candidates, pool,
+                                            iteration_options, rivals)
+            scores = [results[bot] for bot in candidates]
+        else:
+            pairings = [(bot, enemy) for enemy in enemies
+                        for bot in candidates]
+            results = play_pairings(matchNum, pairings, pool,
+                                    iteration_options, rivals=rivals)
+            scores = [sum(results[(bot, enemy)] for enemy in enemies) /
+                      float(matchNum) for bot in candidates]
+
+        gradient = [0.0] * len(variables)
+        for i, delta in enumerate(deltas):
+            difference = scores[2 * i] - scores[2 * i + 1]
+            for j, d in enumerate(delta):
+                gradient[j] += difference / (2 * c * d) / batch
+
+        if gain is None:
+            # the first step moves the values by at most c
+            largest = max(abs(g) for g in gradient)
+            if largest == 0:
+                print('no difference between perturbations, trying again')
+                continue
+            gain = c / largest
+        a = gain / (k + 1) ** SPSA_ALPHA
+        values = [round(x + a * g, 3) for x, g in zip(values, gradient)]
+        if checkpoint is not None:
+            checkpoint.save(step={})
+
+    pool.close()
+    pool.join()
+    for variable, value in zip(variables, values):
+        write_value(variable, robot_file, value)
+
+    return dict(zip(variables, values))
+
+def solve(matrix, vector):
+    """Returns x such that matrix * x = vector, by Gaussian elimination."""
+    n = len(vector)
+    rows = [list(row) + [v] for row, v in zip(matrix, vector)]
+    for i in xrange(n):
+        pivot = max(xrange(i, n), key=lambda r: abs(rows[r][i]))
+        rows[i], rows[pivot] = rows[pivot], rows[i]
+        if rows[i][i] == 0:
+            raise ZeroDivisionError('singular matrix')
+        for r in xrange(n):
+            if r != i:
+                factor = rows[r][i] / rows[i][i]
+                rows[r] = [a - factor * b for a, b in zip(rows[r], rows[i])]
+    return [rows[i][n] / rows[i][i] for i in xrange(n)]
+
+
+class QuadraticFit(object):
+    """A least squares fit of score = a + b*x + c*x**2 to (x, score)
+    observations, which also gives how uncertain its prediction is."""
+
+    def __init__(self, observations):
+        xs = [x for x, y in observations]
+        # x is centered and scaled to keep the normal equations well
+        # conditioned
+        self.center = sum(xs) / float(len(xs))
+        self.scale = max(max(xs) - min(xs), 1e-9) / 2.0
+        rows = [self.features(x) for x in xs]
+        normal = [[sum(r[i] * r[j] for r in rows) for j in xrange(3)]
+                  for i in xrange(3)]
+        self.coefficients = solve(normal, [
+            sum(r[i] * y for r, (x, y) in zip(rows, observations))
+            for i in xrange(3)])
+        # the columns of the inverse of the normal equations
+        self.inverse = [solve(normal, [float(i == j) for j in xrange(3)])
+                        for i in xrange(3)]
+        residuals = sum((y - self.mean(x)) ** 2 for x, y in observations)
+        self.variance = residuals / max(len(observations) - 3, 1)
+
+    def features(self, x):
+        u = (x - self.center) / self.scale
+        return [1.0, u, u * u]
+
+    def mean(self, x):
+        return sum(c * f for c, f in zip(self.coefficients, self.features(x)))
+
+    def deviation(self, x):
+        """The standard deviation of the fitted mean at x."""
+        f = self.features(x)
+        spread = sum(f[i] * self.inverse[i][j] * f[j]
+                     for i in xrange(3) for j in xrange(3))
+        return math.sqrt(max(self.variance * spread, 0.0))
+
+
+def expected_improvement(mean, deviation, best):
+    """The expected amount by which a normally distributed score with mean and
+    deviation beats best."""
+    if deviation <= 0:
+        return max(mean - best, 0.0)
+    z = (mean - best) / float(deviation)
+    cdf = 0.5 * (1 + math.erf(z / math.sqrt(2)))
+    pdf = math.exp(-z * z / 2) / math.sqrt(2 * math.pi)
+    return (mean - best) * cdf + deviation * pdf
+
+
+def surrogate_candidates(observations, count, reach):
+    """Returns the count values to play next, picked one at a time to
+    maximize the expected improvement over the best fitted score of the
+    observations so far, and the largest expected improvement found.
+    Values up to reach beyond the ones observed are considered.
+    Each value picked is taken to score its fitted mean, and isn't picked
+    again, so that the next pick goes elsewhere."""
+    observations = list(observations)
+    xs = [x for x, y in observations]
+    low = min(xs) - reach
+    high = max(xs) + reach
+    grid = sorted(set(round(low + (high - low) * i / (SURROGATE_GRID - 1), 3)
+                      for i in xrange(SURROGATE_GRID)))
+    candidates = []
+    largest = None
+    for i in xrange(count):
+        fit = QuadraticFit(observations)
+        best = max(fit.mean(x) for x in xs)
+        improvement, value = max(
+            (expected_improvement(fit.mean(x), fit.deviation(x), best), x)
+            for x in grid)
+        if largest is None:
+            largest = improvement
+        candidates.append(value)
+        observations.append((value, fit.mean(value)))
+        # the same value twice would be the same pairings, played once
+        grid.remove(value)
+    return candidates, largest
+
+
+def optimize_surrogate(precisionParam, matchNum, enemies, variable,
+                       robot_file, processes, iterations, batch, options):
+    """
+    Tunes variable by fitting a quadratic to the mean score difference per
+    game against the enemies of every value played so far, and playing the
+    batch values where it expects the most improvement next, for up to
+    iterations rounds.
+    The first round plays at least SURROGATE_START values spread over
+    precisionParam either side of the current one, and each round may go up
+    to precisionParam past the values played. It stops early once no value
+    is expected to improve the best score by SURROGATE_MIN_IMPROVEMENT.
+    The file robot_file is modified to contain the best fitted value among
+    those played, and it is returned.
+    options are the TuneOptions of the run. If their checkpoint holds the
+    progress of an interrupted run tuning variable, tuning carries on from
+    there.
+    If they have sampling, the matches are split between the enemies; see
+    EnemyPool.play().
+    """
+    pool = make_pool(processes, robot_file, enemies, options.remote)
+    base_value = get_current_value(variable, robot_file)
+    checkpoint = options.checkpoint
+    observations = []
+    start = 0
+    if checkpoint is not None:
+        if checkpoint.state.get('variable') == variable:
+            start = checkpoint.state['iteration']
+            observations = checkpoint.state['observations']
+            print('RESUMING', variable, 'AT ROUND', start)
+        else:
+            checkpoint.save(variable=variable, iteration=0,
+                            observations=observations, step={})
+
+    for k in xrange(start, iterations):
+        if not observations:
+            count = max(batch, SURROGATE_START)
+            values = [round(base_value + precisionParam *
+                            (2.0 * i / (count - 1) - 1), 3)
+                      for i in xrange(count)]
+        else:
+            values, improvement = surrogate_candidates(observations, batch,
+                                                       precisionParam)
+            print('EXPECTED IMPROVEMENT', improvement)
+            if improvement < SURROGATE_MIN_IMPROVEMENT:
+                break
+        print('ROUND', k, 'PLAYING', ', '.join(str(v) for v in values))
+
+        candidates = make_variants(variable, robot_file, values)
+        round_options = options._replace(
+            seed=None if options.seed is None else options.seed + k)
+        if options.sampling is not None:
+            scores = options.sampling.play(matchNum, candidates, pool,
+                                           round_options, [candidates])
+        else:
+            pairings = [(bot, enemy) for enemy in enemies
+                        for bot in candidates]
+            results = play_pairings(matchNum, pairings, pool, round_options,
+                                    rivals=[candidates])
+            scores = dict((bot, sum(results[(bot, enemy)]
+                                    for enemy in enemies) / float(matchNum))
+                          for bot in candidates)
+        for value, bot in zip(values, candidates):
+            score = scores[bot]
+            observations.append((value, score))
+            print(variable, '=', value, 'scored', score)
+        if checkpoint is not None:
+            checkpoint.save(iteration=k + 1, observations=observations,
+                            step={})
+
+    pool.close()
+    pool.join()
+    fit = QuadraticFit(observations)
+    # ties, as when the value makes no difference, go to the value closest to
+    # the one the run started with
+    best_value = max((round(fit.mean(x), 6), -abs(x - base_value), x)
+                     for x, y in observations)[2]
+    print('best fitted value is', best_value)
+    write_value(variable, robot_file, best_value)
+
+    return best_value
+
+# per-process caches of parsed bot files, of the code compiled from them for
+# each Variant, of the modules made from that and of the Runners playing them,
+# so that a worker loads the map and each bot once instead of once per match
+_bot_trees = {}
+_bot_code = {}
+_bot_modules = {}
+_runners = {}
+# sources of bot files sent along with remote jobs, which replace the files
+_bot_sources = {}
+
+
+def init_worker(bots):
+    """Pool initializer: loads the given bots ahead of the first match.
+    bots are the unmodified robot file and the enemies, which every match
+    of a tuning run plays against."""
+    for bot in bots:
+        load_bot(bot, 0)
+        load_bot(bot, 1)
+
+
+def parse_bot(robot_file):
+    """Returns the parsed module of robot_file."""
+    if robot_file not in _bot_trees:
+        if robot_file in _bot_sources:
+            source = _bot_sources[robot_file]
+        else:
+            with open(robot_file, 'r') as f:
+                source = f.read()
+        _bot_trees[robot_file] = ast.parse(source, robot_file)
+    return _bot_trees[robot_file]
+
+
+def load_code(bot):
+    """Returns the compiled code of the Variant bot: its robot file with the
+    values of the overrides that are numeric constants of the file assigned
+    in place of the file's own, so that module-level code sees them too."""
+    if bot not in _bot_code:
+        tree = parse_bot(bot.robot_file)
+        constants = numeric_constants(bot.robot_file)
+        body = list(tree.body)
+        for variable, value in bot.overrides:
+            if variable in constants:
+                assignment = body[constants[variable]]
+                literal = ast.parse(repr(value), mode='eval').body
+                body[constants[variable]] = ast.fix_missing_locations(
+                    ast.copy_location(ast.Assign(targets=assignment.targets,
+                                                 value=literal), assignment))
+        module = copy.copy(tree)
+        module.body = body
+        _bot_code[bot] = compile(module, bot.robot_file, 'exec')
+    return _bot_code[bot]
+
+
+def forget_file(robot_file):
+    """Makes this process parse and load robot_file afresh, along with the
+    Runners playing it."""
+    _bot_trees.pop(robot_file, None)
+    for key in list(_bot_code):
+        if key.robot_file == robot_file:
+            del _bot_code[key]
+    for key in list(_bot_modules):
+        if key[0].robot_file == robot_file:
+            del _bot_modules[key]
+    for key in list(_runners):
+        if robot_file in (key[0].robot_file, key[1].robot_file):
+            del _runners[key]
+
+
+def use_source(robot_file, source):
+    """Makes this process load robot_file from source instead of from disk,
+    forgetting anything loaded from an older version of it."""
+    if _bot_sources.get(robot_file) == source:
+        return
+    _bot_sources[robot_file] = source
+    forget_file(robot_file)
+
+
+def load_bot(bot, slot):
+    """Returns the module of the Variant bot for player slot, executing the
+    bot's code on first use. Overrides that aren't numeric constants of the
+    file are patched into the module afterwards.
+    Each slot gets its own module, as bots keep per-game state in globals."""
+    key = (bot, slot)
+    if key not in _bot_modules:
+        module = types.ModuleType(
+            os.path.splitext(os.path.basename(bot.robot_file))[0])
+        module.__file__ = bot.robot_file
+        exec(load_code(bot), module.__dict__)
+        for variable, value in bot.overrides:
+            if not hasattr(module, variable):
+                raise NameError('%s is not defined in %s' %
+                                (variable, bot.robot_file))
+            setattr(module, variable, value)
+        _bot_modules[key] = module
+    return _bot_modules[key]
+
+
+def get_runner(bot1, bot2, simulate=False):
+    """Returns this process's Runner playing bot1 against bot2, rgsim's
+    instead of rgkit's if simulate is true."""
+    key = (bot1, bot2, simulate)
+    if key not in _runners:
+        robots = [load_bot(bot, slot).Robot()
+                  for slot, bot in enumerate((bot1, bot2))]
+        if simulate:
+            _runners[key] = rgsim.Runner(robots, options=Options(quiet=4))
+        else:
+            players = [Player(robot=robot) for robot in robots]
+            _runners[key] = Runner(players=players, options=Options(quiet=4))
+    return _runners[key]
+
+
+def forget_bots(bots):
+    """Makes this process load bots afresh, along with the Runners playing
+    them, as a match cut short may leave their modules in the middle of a
+    turn."""
+    for key in list(_bot_modules):
+        if key[0] in bots:
+            del _bot_modules[key]
+    for key in list(_runners):
+        if key[0] in bots or key[1] in bots:
+            del _runners[key]
+
+
+def run_match(bot1, bot2, seed=None, simulate=False):
     #rgkit integration
-    runner = Runner(player_files=(bot1,bot2), options=Options(quiet=4, game_seed=random.randint(0, default_settings.max_seed)))
-    scores0, scores1 = runner.run()[0]
+    if seed is None:
+        seed = random.randint(0, default_settings.max_seed)
+    runner = get_runner(bot1, bot2, simulate)
+    runner.options.game_seed = seed
+    return match_result(bot1, bot2, runner.run()[0])
+
+
+def match_result(bot1, bot2, scores):
+    """Returns the result run_match() gives for bot1 and bot2 scoring
+    scores: both scores, the difference and the winner."""
+    scores0, scores1 = scores
     if scores0 > scores1:
-      return (scores0, scores1, scores0 - scores1, bot1)
+      return (scores0, scores1, scores0 - scores1, str(bot1))
     elif scores1 > scores0:
-      return (scores0, scores1, scores1 - scores0, bot2)
+      return (scores0, scores1, scores1 - scores0, str(bot2))
     else:
       return (scores0, scores1, 0,'tie')
 
 
-def versus(matchNum,bot1, bot2, pool):
-    """Launches a multithreaded comparison between two robot files.
-    run_match() is run in separate processes, one for each CPU core, until 100
-    matches are run.
-    Returns the winner, or 'tie' if there was no winner."""
-    bot1Score = 0
-    bot2Score = 0
+def verify_simulator(pairings, seeds):
+    """Plays each (bot1, bot2) pair in pairings on each of seeds both with
+    rgkit's Runner and with rgsim's, in this process. Returns the
+    (bot1, bot2, seed, rgkit scores, rgsim scores) of the games they don't
+    agree on."""
+    disagreements = []
+    for bot1, bot2 in pairings:
+        for seed in seeds:
+            expected = run_match(bot1, bot2, seed)[:2]
+            simulated = run_match(bot1, bot2, seed, simulate=True)[:2]
+            if simulated != expected:
+                disagreements.append((bot1, bot2, seed, expected, simulated))
+    return disagreements
 
-    matches_to_run = matchNum
 
+def match_seeds(matchNum, seed):
+    """Returns the seeds of the matchNum games of a versus() call.
+    With no seed, every game is played on a fresh random seed."""
+    if seed is None:
+        return [None] * matchNum
+    rng = random.Random(seed)
+    return [rng.randint(0, default_settings.max_seed)
+            for i in xrange(matchNum)]
+
+
+def pool_size(pool):
+    """Returns the number of worker processes of pool."""
+    return pool._processes
+
+
+def sprt_decision(wins, losses, confidence):
+    """Sequential probability ratio test on the decisive games of a versus().
+    Tests bot1 winning SPRT_WIN_RATE of them against bot2 doing so, with both
+    error rates at 1 - confidence.
+    Returns 1 if bot1 is the winner, -1 if bot2 is and 0 if it is too early
+    to tell."""
+    error = 1.0 - confidence
+    bound = math.log((1.0 - error) / error)
+    llr = (wins - losses) * math.log(SPRT_WIN_RATE / (1.0 - SPRT_WIN_RATE))
+    if llr >= bound:
+        return 1
+    elif llr <= -bound:
+        return -1
+    return 0
+
+
+def rivals_decided(comparisons, rivals, confidence, settled=()):
+    """Returns whether, in each group of bots in rivals, sprt_decision() names
+    the one with the best mean score difference so far the winner over each
+    of the others. Two bots are compared on the games in comparisons that
+    they played against the same enemy on the same seed, counting a win for
+    the one with the better score difference.
+    The pairings in settled were not played but found in the cache or the
+    checkpoint, so their games can't be compared: a group with a bot in one
+    of them, or with fewer than two bots being played, is never decided."""
+    for group in rivals:
+        if any(bot in group for bot, enemy in settled):
+            return False
+        results = dict((bot, {}) for bot in group)
+        for (bot, enemy), c in comparisons.items():
+            if bot in results:
+                for index, difference in c.results.items():
+                    results[bot][(enemy, index)] = difference
+        played = [bot for bot in group if results[bot]]
+        if len(played) < 2:
+            return False
+        leader = max(played, key=lambda bot: sum(results[bot].values()) /
+                     float(len(results[bot])))
+        for bot in played:
+            if bot == leader:
+                continue
+            games = set(results[leader]) & set(results[bot])
+            wins = sum(results[leader][g] > results[bot][g] for g in games)
+            losses = sum(results[leader][g] < results[bot][g] for g in games)
+            if sprt_decision(wins, losses, confidence) != 1:
+                return False
+    return True
+
+
+def next_seed(seed):
+    """Returns the seed to replay a tied comparison with."""
+    if seed is None:
+        return None
+    return seed + 1
+
+
+class Comparison(object):
+    """The games played so far between two bots by play_pairings().
+
+    A paired comparison plays each of its seeds twice, once in each player
+    order, and keeps the score difference of each seed in diffs and the
+    number of its orders played in halves."""
+
+    def __init__(self, matchNum, bot1, bot2, seed, paired=False):
+        self.bot1 = bot1
+        self.bot2 = bot2
+        self.paired = paired
+        self.retries = 0
+        self.restart(matchNum, seed)
+
+    def restart(self, matchNum, seed):
+        """Forgets the games played and starts over from seed."""
+        self.matchNum = matchNum
+        self.seed = seed
+        if self.paired:
+            self.seeds = match_seeds((matchNum + 1) // 2, seed)
+            self.diffs = [0] * len(self.seeds)
+            self.halves = [0] * len(self.seeds)
+        else:
+            self.seeds = match_seeds(matchNum, seed)
+        # the indexes of the matches played; in a paired comparison, match i
+        # is seed i // 2 with the players swapped if i is odd
+        self.done = set()
+        self.bot1Score = 0
+        self.bot2Score = 0
+        self.wins = 0
+        self.losses = 0
+        # the score difference of each match played, by index
+        self.results = {}
+        # the sum of the squared score differences of the matches played
+        self.squares = 0
+        # the matches that timed out or crashed MATCH_ATTEMPTS times, which
+        # count as played but add nothing to the scores, and the number of
+        # times each match failed so far
+        self.failed = set()
+        self.attempts = collections.Counter()
+
+    @property
+    def played(self):
+        return len(self.done)
+
+    @property
+    def scored(self):
+        """The number of matches played that have a score."""
+        return len(self.done) - len(self.failed)
+
+    def next_matches(self, batch):
+        """Returns the (index, seed, swap) of the next batch matches to play.
+        """
+        if self.paired:
+            matches = [(i, self.seeds[i // 2], i % 2 == 1)
+                       for i in xrange(2 * len(self.seeds))]
+        else:
+            matches = [(i, s, False) for i, s in enumerate(self.seeds)]
+        return [m for m in matches if m[0] not in self.done][:batch]
+
+    def add(self, index, result):
+        s0, s1, s2, s3 = result
+        print('battle result:',s3, ' difference:', s2)
+        self.bot1Score += s0
+        self.bot2Score += s1
+        self.wins += s0 > s1
+        self.losses += s1 > s0
+        #otherwise, it's a tie, but we can ignore it
+        self.results[index] = s0 - s1
+        self.squares += (s0 - s1) ** 2
+        if self.paired:
+            self.diffs[index // 2] += s0 - s1
+            self.halves[index // 2] += 1
+        self.done.add(index)
+
+    def fail(self, index):
+        """Notes that match index timed out or crashed. Returns whether it
+        has now failed too many times to play it again, in which case it is
+        recorded as failed."""
+        self.attempts[index] += 1
+        if self.attempts[index] < MATCH_ATTEMPTS:
+            return False
+        self.failed.add(index)
+        self.done.add(index)
+        return True
+
+    def winScore(self, matchNum):
+        """Returns bot1's score minus bot2's, scaled up to matchNum games if
+        fewer were played or some of them failed."""
+        if self.scored == 0:
+            return 0
+        if self.scored < matchNum:
+            return (self.bot1Score - self.bot2Score) * matchNum / \
+                    float(self.scored)
+        return self.bot1Score - self.bot2Score
+
+    def mean_difference(self):
+        """Returns the mean score difference of the matches played and the
+        half-width of its 95% confidence interval, which is None until two
+        matches are played."""
+        n = self.scored
+        if n == 0:
+            return 0.0, None
+        mean = (self.bot1Score - self.bot2Score) / float(n)
+        if n < 2:
+            return mean, None
+        variance = max(self.squares - n * mean ** 2, 0) / (n - 1)
+        return mean, 1.96 * math.sqrt(variance / n)
+
+    def to_json(self):
+        data = {'seed': self.seed, 'retries': self.retries,
+                'done': sorted(self.done), 'bot1Score': self.bot1Score,
+                'bot2Score': self.bot2Score, 'wins': self.wins,
+                'losses': self.losses, 'squares': self.squares,
+                'failed': sorted(self.failed),
+                'results': sorted(self.results.items())}
+        if self.paired:
+            data['diffs'] = self.diffs
+            data['halves'] = self.halves
+        return data
+
+    def load_json(self, matchNum, data):
+        """Restores the progress saved by to_json()."""
+        self.retries = data['retries']
+        self.restart(matchNum, data['seed'])
+        self.done = set(data['done'])
+        self.bot1Score = data['bot1Score']
+        self.bot2Score = data['bot2Score']
+        self.wins = data['wins']
+        self.losses = data['losses']
+        self.squares = data.get('squares', 0)
+        self.failed = set(data.get('failed', []))
+        self.results = dict(data.get('results', []))
+        if self.paired:
+            self.diffs = data['diffs']
+            self.halves = data['halves']
+
+    def seed_diffs(self):
+        """Returns the score difference of each seed of a paired comparison,
+        or None for the seeds that weren't played in both player orders."""
+        return [d if h == 2 else None for d, h in zip(self.diffs, self.halves)]
+
+
+def pairing_key(pairing):
+    """Returns the key of pairing in a checkpoint's step."""
+    return json.dumps([variant_to_json(bot) for bot in pairing])
+
+
+def step_seed(checkpoint):
+    """Returns a random seed for the matches of the current step, saved to
+    the step of checkpoint, if given, so that a resumed run plays the step on
+    the same seeds, and finds its results in the cache again."""
+    step = {}
+    if checkpoint is not None:
+        step = checkpoint.state.setdefault('step', {})
+    if step.get('seed') is None:
+        step['seed'] = random.randint(0, default_settings.max_seed)
+        if checkpoint is not None:
+            checkpoint.save(step=step)
+    return step['seed']
+
+
+def worker_name():
+    """Returns the name of this process in metrics, as host:pid."""
+    return '%s:%d' % (socket.gethostname(), os.getpid())
+
+
+class MatchTimeout(BaseException):
+    """Raised in a match that runs past its deadline. It is not an Exception,
+    so that rgkit doesn't take it for an error of the robot it interrupts."""
+
+
+def raise_timeout(signum, frame):
+    raise MatchTimeout()
+
+
+def run_match_within(bot1, bot2, seed, timeout, simulate=False):
+    """run_match(), raising MatchTimeout if it takes over timeout seconds."""
+    if not timeout or not hasattr(signal, 'setitimer'):
+        return run_match(bot1, bot2, seed, simulate)
+    handler = signal.signal(signal.SIGALRM, raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
     try:
-        results = [pool.apply_async(run_match, (bot1, bot2))
-                   for i in xrange(matches_to_run)]
-        for r in results:
-            s0, s1, s2, s3 = r.get(timeout=120)
-            print('battle result:',s3, ' difference:', s2)
-            bot1Score += s0
-            bot2Score += s1
+        return run_match(bot1, bot2, seed, simulate)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, handler)
+
+
+def run_job(job):
+    """Plays the matches of a play_pairings() job, a
+    (pairing, matches, bot1, bot2, timeout, simulate) tuple where matches is
+    a list of (index, seed, swap), one after the other. Returns the pairing,
+    the (index, scores) of each match and the worker_name() of the process
+    that played them. If swap is true, bot2 plays first, but bot1's score is
+    still given first.
+    If a match takes over timeout seconds or raises, its scores are 'timeout'
+    or 'crash' instead."""
+    pairing, matches, bot1, bot2, timeout, simulate = job
+    results = []
+    for index, seed, swap in matches:
+        try:
+            if swap:
+                s1, s0 = run_match_within(bot2, bot1, seed, timeout,
+                                          simulate)[:2]
+                scores = (s0, s1)
+            else:
+                scores = run_match_within(bot1, bot2, seed, timeout,
+                                          simulate)[:2]
+        except MatchTimeout:
+            scores = 'timeout'
+            forget_bots((bot1, bot2))
+        except Exception:
+            traceback.print_exc()
+            scores = 'crash'
+            forget_bots((bot1, bot2))
+        results.append((index, scores))
+    return pairing, results, worker_name()
 
-            #otherwise, it's a tie, but we can ignore it
 
-        print('overall:', bot1, bot1Score, ':', bot2Score, bot2)
-        return bot1Score - bot2Score
+def profile_job(job):
+    """run_job() with the functions of both bots timed. Returns its result
+    followed by the BotProfile of the matches."""
+    pairing, matches, bot1, bot2, timeout, simulate = job
+    profile = rgprofile.BotProfile()
+    results = []
+    for index, seed, swap in matches:
+        if seed is None:
+            # pick the seed here so that the slowest turns can be replayed
+            seed = random.randint(0, default_settings.max_seed)
+        bots = [(bot1, 0), (bot2, 1)]
+        if swap:
+            bots = [(bot2, 0), (bot1, 1)]
+        turns = []
+        for bot, slot in bots:
+            bot_turns = rgprofile.profile_bot(load_bot(bot, slot))
+            bot_turns.clear()
+            turns.append((os.path.basename(bot.robot_file), bot_turns))
+        result, match_profile = rgprofile.profile_match(
+            run_job, (pairing, [(index, seed, swap)], bot1, bot2, timeout,
+                      simulate))
+        results.extend(result[1])
+        for bot, bot_turns in turns:
+            match_profile.add_turns(bot, seed, bot_turns)
+        profile.merge(match_profile)
+    return pairing, results, worker_name(), profile
+
+
+def run_remote_job(func_name, job, sources):
+    """Plays a job handed to an rgworker.py process by a RemotePool: loads the
+    bot files from sources, then calls run_job() or profile_job(), whichever
+    func_name names."""
+    for robot_file, source in sources.items():
+        use_source(robot_file, source)
+    return {'run_job': run_job, 'profile_job': profile_job}[func_name](job)
+
+
+def play_pairings(matchNum, pairings, pool, options=None, tie_retries=0,
+                  diffs=None, games=None, rivals=None):
+    """Compares the two bots of each (bot1, bot2) pair in pairings, playing the
+    matches of all pairings at once so that every process stays busy.
+    Results are collected as they complete. options are the TuneOptions to
+    play them with.
+
+    If seed is given, the games are played on seeds derived from it, so the
+    comparison can be repeated exactly.
+    If confidence is given, games are played one batch per process at a time
+    and matchNum is the most games played. If rivals is given, a list of
+    groups of bots the caller picks between, whose pairings against the same
+    enemies all stop together as soon as rivals_decided() at that confidence,
+    and are played to matchNum if a group has a bot with a pairing found in
+    the cache; they are played on common seeds, drawn here with step_seed()
+    if seed isn't given.
+    Otherwise each comparison stops as soon as sprt_decision() names its own
+    winner. The score difference is scaled up to what matchNum games would
+    give, so results with different numbers of games can be added up; such
+    results are not stored in the cache.
+    A tied comparison is replayed on new seeds up to tie_retries times
+    (forever if tie_retries is None).
+    Results found in the cache are reused, and new ones are stored in it.
+    If checkpoint is given, the progress of every pairing is saved to its step
+    after each batch of results, and the matches it already holds are not
+    played again.
+    If paired is true, matchNum games, rounded up to an even number, are
+    played on half as many seeds, once in each player order, so that every
+    pairing is played on the same maps and spawns; the seed_diffs() of each
+    pairing, played or found in the cache, are then put in diffs, if given.
+    If profile is given, the bots are timed with profile_job().
+    A match that runs past MATCH_TIMEOUT seconds or crashes is played again,
+    up to MATCH_ATTEMPTS times, after which it is left out of the scores.
+    The workers are handed the matches of a pairing up to MATCH_BATCH at a
+    time, and send back just their scores.
+    If games is given, it holds the number of matches of each pairing, which
+    are played in place of matchNum.
+    Returns a dict of the score difference of each pairing.
+    """
+    if options is None:
+        options = TuneOptions()
+    cache, seed, confidence = options.cache, options.seed, options.confidence
+    checkpoint, paired = options.checkpoint, options.paired
+    profile, metrics = options.profile, options.metrics
+    if confidence is not None and rivals is not None and seed is None:
+        seed = step_seed(checkpoint)
+    scores = {}
+    comparisons = {}
+    step = {}
+    if checkpoint is not None:
+        step = checkpoint.state.setdefault('step', {})
+    for bot1, bot2 in pairings:
+        saved = step.get(pairing_key((bot1, bot2)))
+        if saved is not None and 'score' in saved:
+            scores[(bot1, bot2)] = saved['score']
+            if paired and diffs is not None and 'diffs' in saved:
+                diffs[(bot1, bot2)] = saved['diffs']
+            continue
+        n = matchNum if games is None else games[(bot1, bot2)]
+        if paired:
+            n += n % 2
+        if saved is None and cache is not None:
+            winScore = cache.get(bot1, bot2, seed, n, paired)
+            if winScore is not None:
+                print('ALREADY SCORED', bot1, 'vs', bot2)
+                scores[(bot1, bot2)] = winScore
+                if paired and diffs is not None:
+                    seed_diffs = cache.get_diffs(bot1, bot2, seed, n)
+                    if seed_diffs is not None:
+                        diffs[(bot1, bot2)] = seed_diffs
+                continue
+        comparisons[(bot1, bot2)] = Comparison(n, bot1, bot2, seed, paired)
+        if saved is not None:
+            comparisons[(bot1, bot2)].load_json(n, saved)
+    # every comparison played, and every pairing that isn't, for
+    # rivals_decided()
+    played = dict(comparisons)
+    settled = set(scores)
+
+    def save_progress():
+        if checkpoint is not None:
+            for pairing, c in comparisons.items():
+                step[pairing_key(pairing)] = c.to_json()
+            for pairing, winScore in scores.items():
+                step[pairing_key(pairing)] = {'score': winScore}
+                if paired and diffs is not None and pairing in diffs:
+                    step[pairing_key(pairing)]['diffs'] = diffs[pairing]
+            checkpoint.save(step=step)
+
+    if confidence is None:
+        batch = matchNum if games is None else max(games.values())
+    else:
+        batch = pool_size(pool)
+    try:
+        while comparisons:
+            matches = [(pairing, c.next_matches(batch))
+                       for pairing, c in comparisons.items()]
+            # as many matches per job as keeps every process busy, up to
+            # MATCH_BATCH
+            size = sum(len(m) for pairing, m in matches)
+            size = max(1, min(MATCH_BATCH, -(-size // pool_size(pool))))
+            jobs = []
+            for pairing, m in matches:
+                c = comparisons[pairing]
+                for i in xrange(0, len(m), size):
+                    jobs.append((pairing, m[i:i + size], c.bot1, c.bot2,
+                                 MATCH_TIMEOUT, SIMULATE))
+            if profile is None:
+                results = pool.imap_unordered(run_job, jobs)
+            else:
+                results = pool.imap_unordered(profile_job, jobs)
+            if metrics is not None:
+                metrics.submitted(comparisons,
+                                  sum(len(job[1]) for job in jobs))
+            waiting = set((job[0], index) for job in jobs
+                          for index, s, swap in job[1])
+            # matches time out in the workers, so give up waiting for a job
+            # only if a worker is lost
+            wait = None
+            if MATCH_TIMEOUT:
+                wait = 2 * MATCH_TIMEOUT * size + 10
+            for i in xrange(len(jobs)):
+                try:
+                    job_result = results.next(timeout=wait)
+                except (multiprocessing.TimeoutError, queue.Empty):
+                    # a worker died, or hung where its deadline can't stop it.
+                    # the matches still out are played again next round
+                    print('NO JOB FINISHED IN', wait, 'SECONDS, RESUBMITTING',
+                          len(waiting), 'MATCHES')
+                    if metrics is not None:
+                        metrics.stalled(len(waiting))
+                    for pairing, index in waiting:
+                        comparisons[pairing].fail(index)
+                    break
+                pairing, job_scores, worker = job_result[:3]
+                if profile is not None:
+                    profile.merge(job_result[3])
+                c = comparisons[pairing]
+                for index, outcome in job_scores:
+                    waiting.discard((pairing, index))
+                    if outcome in ('timeout', 'crash'):
+                        recorded = c.fail(index)
+                        print('MATCH', index, 'OF', c.bot1, 'vs', c.bot2,
+                              'FAILED:', outcome)
+                        if recorded:
+                            print('GAVE UP ON IT AFTER', MATCH_ATTEMPTS,
+                                  'TRIES')
+                        if metrics is not None:
+                            metrics.failed(c, index, outcome, worker, recorded)
+                    else:
+                        result = match_result(c.bot1, c.bot2, outcome)
+                        c.add(index, result)
+                        if metrics is not None:
+                            metrics.game(c, index, result, worker)
+                if (i + 1) % pool_size(pool) == 0:
+                    save_progress()
+
+            rivals_done = confidence is not None and rivals is not None and \
+                    rivals_decided(played, rivals, confidence, settled)
+            for pairing, c in list(comparisons.items()):
+                if c.played < c.matchNum:
+                    if confidence is None:
+                        continue
+                    if rivals is None and \
+                            sprt_decision(c.wins, c.losses, confidence) == 0:
+                        continue
+                    # a comparison replayed after a tie is on seeds of its own
+                    if rivals is not None and (c.retries or not rivals_done):
+                        continue
+                    print('decided after', c.played, 'matches')
+                print('overall:', c.bot1, c.bot1Score, ':', c.bot2Score,
+                      c.bot2)
+                winScore = c.winScore(c.matchNum)
+                if winScore == 0 and (tie_retries is None or
+                                      c.retries < tie_retries):
+                    print('VERSUS WAS A TIE. RETRYING...')
+                    c.retries += 1
+                    c.restart(c.matchNum, next_seed(c.seed))
+                    continue
+                if winScore == 0 and c.retries:
+                    print('STILL A TIE AFTER', c.retries, 'RETRIES.')
+                if metrics is not None:
+                    metrics.decided(c, winScore)
+                # ties are never stored, as they settle nothing, and neither
+                # are comparisons cut short, which would stand in for full
+                # ones
+                if cache is not None and winScore != 0 and \
+                        c.played >= c.matchNum:
+                    cache.put(c.bot1, c.bot2, c.seed, c.matchNum, winScore,
+                              paired, c.seed_diffs() if paired else None)
+                if paired and diffs is not None:
+                    diffs[pairing] = c.seed_diffs()
+                scores[pairing] = winScore
+                del comparisons[pairing]
+            save_progress()
 
     except KeyboardInterrupt:
         print('user did ctrl+c, ABORT EVERYTHING')
         pool.terminate()
-        for bot in filesRemaining:
-            os.remove(bot)
         raise KeyboardInterrupt()
 
-def run_tourney(matchNum,enemies, botfiles, pool):
-    """Runs a tournament between all bot files in botfiles.
+    return scores
+
+
+def versus(matchNum,bot1, bot2, pool, seed=None, confidence=None):
+    """Launches a multithreaded comparison between two robot files.
+    run_match() is run in separate processes, one for each CPU core, until
+    matchNum matches are run. See play_pairings() for seed and confidence.
+    Returns bot1's score minus bot2's; 0 is a tie."""
+    return play_pairings(matchNum, [(bot1, bot2)], pool, TuneOptions(
+        seed=seed, confidence=confidence))[(bot1, bot2)]
+
+
+def paired_difference(bot, base, enemies, diffs):
+    """Returns the mean and standard error over the seeds of a paired
+    tournament of bot's score difference minus base's, or None if the
+    seed_diffs() of some of the pairings are unknown. Only the seeds
+    both bots played in both player orders against every enemy count."""
+    pairings = [(b, enemy) for enemy in enemies for b in (bot, base)]
+    if any(pairing not in diffs for pairing in pairings):
+        return None
+    seed_diffs = []
+    for i in xrange(len(diffs[pairings[0]])):
+        if any(diffs[pairing][i] is None for pairing in pairings):
+            continue
+        seed_diffs.append(sum(diffs[(bot, enemy)][i] - diffs[(base, enemy)][i]
+                              for enemy in enemies))
+    n = len(seed_diffs)
+    if n == 0:
+        return None
+    mean = sum(seed_diffs) / float(n)
+    if n < 2:
+        return mean, 0.0
+    variance = sum((d - mean) ** 2 for d in seed_diffs) / (n - 1)
+    return mean, math.sqrt(variance / n)
+
+
+class Ratings(object):
+    """Glicko ratings of a set of bots, updated after every encounter."""
+
+    Q = math.log(10) / 400
+
+    def __init__(self, bots):
+        self.rating = dict((bot, RATING_START) for bot in bots)
+        self.deviation = dict((bot, RATING_DEVIATION) for bot in bots)
+        self.encounters = collections.Counter()
+
+    def g(self, deviation):
+        return 1 / math.sqrt(1 + 3 * (self.Q * deviation / math.pi) ** 2)
+
+    def expected(self, bot1, bot2):
+        """Returns the expected score of bot1 against bot2, from 0 to 1."""
+        return 1 / (1 + 10 ** (-self.g(self.deviation[bot2]) *
+                                (self.rating[bot1] - self.rating[bot2]) / 400))
+
+    def information(self, bot1, bot2):
+        """Returns how much an encounter between bot1 and bot2 is expected to
+        narrow down their ratings."""
+        e = self.expected(bot1, bot2)
+        return (self.deviation[bot1] ** 2 + self.deviation[bot2] ** 2) * \
+                e * (1 - e)
+
+    def update(self, bot1, bot2, score):
+        """Rates an encounter in which bot1 scored score (1 for a win, 0.5 for
+        a tie and 0 for a loss) against bot2."""
+        updates = []
+        for bot, other, s in ((bot1, bot2, score), (bot2, bot1, 1 - score)):
+            g = self.g(self.deviation[other])
+            e = self.expected(bot, other)
+            precision = 1 / self.deviation[bot] ** 2 + \
+                    self.Q ** 2 * g ** 2 * e * (1 - e)
+            updates.append((bot, self.rating[bot] +
+                            self.Q / precision * g * (s - e),
+                            math.sqrt(1 / precision)))
+        for bot, rating, deviation in updates:
+            self.rating[bot] = rating
+            self.deviation[bot] = deviation
+            self.encounters[bot] += 1
+
+    def report(self):
+        """Prints the bots ranked by rating."""
+        print('%4s %-40s %8s %8s %10s' % ('rank', 'bot', 'rating', '+-',
+                                          'encounters'))
+        ranked = sorted(self.rating, key=lambda b: -self.rating[b])
+        for rank, bot in enumerate(ranked):
+            print('%4d %-40s %8.1f %8.1f %10d' % (
+                rank + 1, bot, self.rating[bot], 2 * self.deviation[bot],
+                self.encounters[bot]))
+
+
+def schedule_encounters(ratings, botfiles, bots, count):
+    """Returns the count pairings of the next round of run_rating_tourney(),
+    or as many as there are: botfiles take turns, most uncertain first, each
+    playing the bot an encounter with tells the most, without playing the
+    same two bots twice in a round."""
+    pairings = []
+    paired = set()
+    order = sorted(botfiles, key=lambda b: -ratings.deviation[b])
+    while len(pairings) < count:
+        scheduled = len(pairings)
+        for bot in order[:count - len(pairings)]:
+            opponents = [other for other in bots if other != bot and
+                         frozenset((bot, other)) not in paired]
+            if not opponents:
+                continue
+            other = max(opponents, key=lambda o: ratings.information(bot, o))
+            paired.add(frozenset((bot, other)))
+            pairings.append((bot, other))
+        if len(pairings) == scheduled:
+            break
+    return pairings
+
+
+def run_rating_tourney(matchNum, enemies, botfiles, pool, options):
+    """Runs a tournament between all bots in botfiles and enemies that rates
+    them as it goes, spending games where the ratings are least certain.
+    Each round, every bot in botfiles has an encounter of RATING_GAMES games
+    with the bot, out of the others and the enemies, that narrows down their
+    ratings the most, and more encounters are scheduled the same way until
+    the round keeps every process of the pool busy. It stops once the ratings
+    of botfiles are settled or matchNum games per bot in botfiles were
+    played.
+    The last bot in botfiles is the base, which stays the winner unless
+    another is rated higher by more than their combined rating deviation.
+    Prints the ranking and returns the winner."""
+    ratings = Ratings(botfiles + enemies)
+    played = 0
+    round_ = 0
+    encounters = max(len(botfiles), -(-pool_size(pool) // RATING_GAMES))
+    while played < matchNum * len(botfiles) and \
+            max(ratings.deviation[b] for b in botfiles) > RATING_SETTLED:
+        pairings = schedule_encounters(ratings, botfiles, botfiles + enemies,
+                                       encounters)
+        if not pairings:
+            # a lone bot has no one to play
+            break
+        # the encounters are too short to cache, checkpoint or cut short
+        round_options = TuneOptions(
+            seed=None if options.seed is None else options.seed + round_,
+            profile=options.profile, metrics=options.metrics)
+        results = play_pairings(RATING_GAMES, pairings, pool, round_options)
+        for bot1, bot2 in pairings:
+            score = results[(bot1, bot2)]
+            ratings.update(bot1, bot2, 0.5 if score == 0 else float(score > 0))
+        played += RATING_GAMES * len(pairings)
+        round_ += 1
+    ratings.report()
+    base = botfiles[-1]
+    best = max(botfiles, key=lambda b: ratings.rating[b])
+    margin = math.hypot(ratings.deviation[best], ratings.deviation[base])
+    if ratings.rating[best] - ratings.rating[base] > margin:
+        return best
+    return base
+
+
+def run_paired_tourney(matchNum, enemies, botfiles, pool, options):
+    """Runs a tournament between all bots in botfiles in which every bot plays
+    each enemy on the same seeds, in both player orders.
+    The last bot in botfiles is the base the others are measured against with
+    paired differences. The winner is the bot whose paired difference over
+    the base is largest, out of those for which it is more than
+    PAIRED_ERRORS standard errors above 0, or the base if there is none.
+    If some of the pairings were found in a cache that doesn't hold their
+    score difference per seed, the bots are compared by their total score
+    instead, and the base wins ties.
     Returns the winner of the tournament."""
-    bestWin = ['', -5000]
     scores = {}
     for bot1 in botfiles:
-        filesRemaining.append(bot1)
         scores[bot1] = 0
-    for enemy in enemies:
-        for bot1 in botfiles:
-            if bot1 in botScores[enemy] and botScores[enemy][bot1] != 0:
-                winScore = botScores[enemy][bot1]
-                print('ALREADY SCORED',str(bot1))
+    diffs = {}
+    pairings = [(bot1, enemy) for enemy in enemies for bot1 in botfiles]
+    results = play_pairings(matchNum, pairings, pool,
+                            options._replace(paired=True), diffs=diffs,
+                            rivals=[botfiles])
+    for bot1, enemy in pairings:
+        scores[bot1] += results[(bot1, enemy)]
+    print(dict((str(b), s) for b, s in scores.items()))
+
+    base = botfiles[-1]
+    differences = {}
+    for bot1 in botfiles[:-1]:
+        differences[bot1] = paired_difference(bot1, base, enemies, diffs)
+        if differences[bot1] is not None:
+            print('paired difference of', bot1, 'over', base, ': %.2f +- %.2f'
+                  % differences[bot1], 'per seed')
+    best = base
+    if None in differences.values():
+        print('some results came from the cache without their seeds, '
+              'comparing total scores')
+        for bot1 in botfiles[:-1]:
+            if scores[bot1] > scores[best]:
+                best = bot1
+        print('Best Score:', scores[best])
+        return best
+    best_mean = 0
+    for bot1, (mean, error) in differences.items():
+        if mean > PAIRED_ERRORS * error and mean > best_mean:
+            best, best_mean = bot1, mean
+    print('Best paired difference:', best_mean)
+    return best
+
+
+class EnemyPool(object):
+    """Enemies with weights, of which sampled tourneys play each a share of
+    the matches rather than all of them.
+
+    The weights are how much each enemy counts in a candidate's score. The
+    matches are split between the enemies in proportion to their weight
+    times how far apart the candidates scored against them in the last
+    tourney, relative to the enemy that told them apart best, down to
+    SAMPLE_FLOOR of their weight."""
+
+    def __init__(self, enemies, weights, separation=None):
+        self.enemies = enemies
+        self.weights = weights
+        # the standard deviation of the candidates' mean score difference per
+        # game against each enemy in the last tourney, by robot file
+        self.separation = separation or {}
+
+    def shares(self):
+        top = max(self.separation.values() or [0])
+        shares = []
+        for enemy, weight in zip(self.enemies, self.weights):
+            separation = self.separation.get(enemy.robot_file)
+            if separation is None or top == 0:
+                shares.append(weight)
             else:
-                winScore = versus(matchNum,bot1, enemy, pool)
-                botScores[enemy][bot1] = winScore
-            while winScore == 0:
-                print('VERSUS WAS A TIE. RETRYING...')
-                winScore = versus(matchNum,bot1, enemy, pool)
-                print('Difference in score:',str(bestWin[1]))
-            scores[bot1] += winScore
-        print(scores)
+                shares.append(weight * (SAMPLE_FLOOR + (1 - SAMPLE_FLOOR) *
+                                        separation / top))
+        return shares
+
+    def games(self, matchNum):
+        """Splits matchNum matches between the enemies by their shares(),
+        returning the number of matches of each."""
+        shares = self.shares()
+        exact = [matchNum * share / sum(shares) for share in shares]
+        games = [int(e) for e in exact]
+        # the matches left over go to the largest remainders
+        left = matchNum - sum(games)
+        for i in sorted(xrange(len(exact)),
+                        key=lambda i: games[i] - exact[i])[:left]:
+            games[i] += 1
+        return games
+
+    def play(self, matchNum, candidates, pool, options, rivals=None):
+        """Plays matchNum matches of each of candidates, split between the
+        enemies by games(), with every candidate playing an enemy on the same
+        seeds, with the TuneOptions options. The seeds are drawn here with
+        step_seed() if options has no seed. See play_pairings() for rivals.
+        Returns the score of each candidate, the weighted mean of its
+        score difference per game against each enemy played."""
+        if options.seed is None:
+            options = options._replace(seed=step_seed(options.checkpoint))
+        games = {}
+        for enemy, n in zip(self.enemies, self.games(matchNum)):
+            if options.paired:
+                # as play_pairings() plays them
+                n += n % 2
+            if n > 0:
+                print('PLAYING', n, 'MATCHES AGAINST', enemy)
+                games[enemy] = n
+        pairings = [(bot, enemy) for enemy in games for bot in candidates]
+        results = play_pairings(matchNum, pairings, pool, options, games=dict(
+            ((bot, enemy), games[enemy]) for bot, enemy in pairings),
+            rivals=rivals)
+        weights = dict(zip(self.enemies, self.weights))
+        total = sum(weights[enemy] for enemy in games)
+        scores = {}
+        for bot in candidates:
+            scores[bot] = sum(weights[enemy] * results[(bot, enemy)] / float(n)
+                              for enemy, n in games.items()) / total
+        if len(candidates) > 1:
+            for enemy, n in games.items():
+                means = [results[(bot, enemy)] / float(n) for bot in candidates]
+                mean = sum(means) / len(means)
+                self.separation[enemy.robot_file] = math.sqrt(
+                    sum((m - mean) ** 2 for m in means) / len(means))
+            if options.checkpoint is not None:
+                options.checkpoint.save(separation=self.separation)
+        return scores
+
+
+def run_sampled_tourney(matchNum, enemy_pool, botfiles, pool, options):
+    """Runs a tournament between all bots in botfiles in which each bot plays
+    matchNum matches in all, split between the enemies of enemy_pool; see
+    EnemyPool.play(). The last bot in botfiles wins ties.
+    Returns the winner of the tournament."""
+    scores = enemy_pool.play(matchNum, botfiles, pool, options, [botfiles])
+    print(dict((str(b), s) for b, s in scores.items()))
+    best = botfiles[-1]
+    for bot in botfiles:
+        if scores[bot] > scores[best]:
+            best = bot
+    print('Best Score:', scores[best])
+    return best
+
+
+def run_tourney(matchNum,enemies, botfiles, pool, options):
+    """Runs a tournament between all bots in botfiles.
+    The matches of every bot against every enemy are played together.
+    Returns the winner of the tournament."""
+    bestWin = ['', -5000]
+    scores = {}
+    for bot1 in botfiles:
+        scores[bot1] = 0
+    pairings = [(bot1, enemy) for enemy in enemies for bot1 in botfiles]
+    results = play_pairings(matchNum, pairings, pool, options,
+                            options.tie_retries, rivals=[botfiles])
+    for bot1, enemy in pairings:
+        scores[bot1] += results[(bot1, enemy)]
+    print(dict((str(b), s) for b, s in scores.items()))
     for bot1 in botfiles:
         for bot2 in botfiles:
             if bot1 != bot2 and scores[bot1] == scores[bot2]:
                 print("Two bots have same score, finding the winner")
-                bestWin[1] = versus(matchNum,bot1, bot2, pool)
-                while bestWin[1] == 0:
-                    print("Wow. Another Tie.")
-                    bestWin[1] = versus(matchNum,bot1, bot2, pool)
+                bestWin[1] = play_pairings(
+                    matchNum, [(bot1, bot2)], pool, options,
+                    options.tie_retries)[(bot1, bot2)]
                 if bestWin[1] < 0:
                     bestWin[0] = bot2
                 elif bestWin[1] > 0:
                     bestWin[0] = bot1
                 else:
-                    print("WTF? Impossible Tie.")
+                    print("Still tied, keeping", bot1)
+                    bestWin[0] = bot1
             elif scores[bot1] > bestWin[1]:
                 bestWin[1] = scores[bot1]
                 bestWin[0] = bot1
 
-    for bf in botfiles:
-        if not bf == bestWin[0]:
-            print('removing',bf)
-            os.remove(bf)
-            filesRemaining.remove(bf)
     print('Best Score:',str(bestWin[1]))
     return bestWin[0]
 
 
+def parse_enemies(enemies):
+    """Turns a comma-separated list of enemy files, each optionally followed
+    by :weight, into their Variants and weights. Weights default to 1."""
+    bots = []
+    weights = []
+    for enemy in enemies.split(','):
+        weight = 1.0
+        if ':' in enemy:
+            name, value = enemy.rsplit(':', 1)
+            try:
+                enemy, weight = name, float(value)
+            except ValueError:
+                pass
+        bots.append(Variant(enemy, ()))
+        weights.append(weight)
+    return bots, weights
+
+
 def main():
-    
+    global MATCH_TIMEOUT, WORKER_MATCHES, SIMULATE
+
     parser = argparse.ArgumentParser(
         description="Optimize constant values for robotgame.")
     parser.add_argument(
-        "constant", type=str, help='The constant name to optimize.')
+        "constant", type=str,
+        help='A comma-separated list of the constants to optimize, or ALL '
+             'for every upper case module-level float constant named '
+             '*_WEIGHT or *_BIAS in the file.')
     parser.add_argument(
         "file", type=str, help='The file of the robot to optimize.')
     parser.add_argument(
-        "enemies", type=str, help='A comma-separated list of the enemy files.')
+        "enemies", type=str,
+        help='A comma-separated list of the enemy files, each optionally '
+             'followed by :weight for --sample.')
     parser.add_argument(
         "-pr", "--precision",
         default=8.0,
@@ -212,13 +1801,240 @@ def main():
         "-p", "--processes",
         default=multiprocessing.cpu_count(),
         type=int, help='The number of processes to simulate in')
+    parser.add_argument(
+        "-s", "--seed",
+        default=None,
+        type=int, help='Play every comparison on seeds derived from this one, '
+                       'making results reproducible. Without it, --sample '
+                       'and --confidence draw seeds of their own each step, '
+                       'so their results are never found in the cache')
+    parser.add_argument(
+        "-pa", "--paired",
+        action='store_true',
+        help='Play all candidates on the same seeds, in both player orders, '
+             'and compare them by their paired score differences')
+    parser.add_argument(
+        "-sa", "--sample",
+        action='store_true',
+        help='Split the --matches of each candidate between the enemies '
+             'instead of playing them all against each enemy, in proportion '
+             'to the weights given as enemy.py:weight and to how well each '
+             'enemy told the candidates apart last time')
+    parser.add_argument(
+        "-rt", "--rating",
+        action='store_true',
+        help='Rate the candidates of the greedy optimizer against each other '
+             'and the enemies, playing where their ratings are least certain; '
+             '--matches is then the most matches played per candidate')
+    parser.add_argument(
+        "-c", "--cache",
+        default=None,
+        type=str, help='The file to store match results in between runs; '
+                       'rgtuner_cache.sqlite by default; see --seed')
+    parser.add_argument(
+        "--no-cache",
+        action='store_true',
+        help='Replay every comparison instead of reusing stored results')
+    parser.add_argument(
+        "-cf", "--confidence",
+        default=None,
+        type=float, help='Stop playing the candidates as soon as the best '
+                         'one (of each pair of perturbations, for spsa) is '
+                         'known at this confidence (e.g. 0.95); --matches '
+                         'is then the most matches played')
+    parser.add_argument(
+        "-t", "--tie-retries",
+        default=3,
+        type=int, help='The number of times a tied comparison is replayed')
+    parser.add_argument(
+        "-o", "--optimizer",
+        default='greedy', choices=['greedy', 'spsa', 'surrogate'],
+        help='greedy tunes one constant at a time; spsa tunes all of them '
+             'together; surrogate tunes one at a time, fitting the scores of '
+             'all the values played so far to pick the next ones')
+    parser.add_argument(
+        "-i", "--iterations",
+        default=20,
+        type=int, help='The number of iterations of the spsa optimizer, or '
+                       'the most rounds of the surrogate one')
+    parser.add_argument(
+        "-b", "--batch",
+        default=4,
+        type=int, help='The number of perturbations the spsa optimizer plays '
+                       'per iteration, or of values the surrogate one plays '
+                       'per round')
+    parser.add_argument(
+        "-l", "--listen",
+        default=None,
+        type=str, help='Serve the matches at this host:port to rgworker.py '
+                       'processes instead of playing them locally; '
+                       '--processes is then the number of workers expected')
+    parser.add_argument(
+        "-a", "--authkey",
+        default=None,
+        type=str, help='The password rgworker.py processes must connect with; '
+                       'a random one is made up and printed if not given')
+    parser.add_argument(
+        "-k", "--checkpoint",
+        default=None,
+        type=str, help='The file to save the progress of the run to; by '
+                       'default rgtuner_checkpoint_<id>.json, where id is '
+                       'made from the robot file, the constants, the enemies '
+                       'and the optimizer')
+    parser.add_argument(
+        "-r", "--resume",
+        action='store_true',
+        help='Carry on from the checkpoint of an interrupted run with the '
+             'same arguments')
+    parser.add_argument(
+        "-f", "--force",
+        action='store_true',
+        help='Start over, replacing the checkpoint of an interrupted run')
+    parser.add_argument(
+        "-pf", "--profile",
+        action='store_true',
+        help='Time the functions of the bots and their turns in every match '
+             'played, and print the hottest ones and the slowest turns at '
+             'the end')
+    parser.add_argument(
+        "-e", "--events",
+        default=None,
+        type=str, help='The file to log every game, decided comparison and '
+                       'status to, as lines of JSON')
+    parser.add_argument(
+        "-st", "--status",
+        default=None,
+        type=float, help='Print how fast games are played and where each '
+                         'comparison stands every this many seconds')
+    parser.add_argument(
+        "-mt", "--match-timeout",
+        default=MATCH_TIMEOUT,
+        type=float, help='The seconds a match may take before it is played '
+                         'again, and eventually left out; 0 for no limit')
+    parser.add_argument(
+        "-wm", "--worker-matches",
+        default=WORKER_MATCHES,
+        type=int, help='The number of matches a worker process plays before '
+                       'it is replaced by a fresh one; 0 for no limit. Local '
+                       'processes count jobs of up to %d matches instead, '
+                       'and are replaced after WORKER_MATCHES / %d jobs' %
+                       (MATCH_BATCH, MATCH_BATCH))
+    parser.add_argument(
+        "-sim", "--simulate",
+        action='store_true',
+        help="Play the matches with rgsim instead of rgkit's Runner if it "
+             "gives the same scores as rgkit on a few games against every "
+             "enemy; otherwise rgkit is used")
     args = vars(parser.parse_args())
-    eList = args['enemies'].split(',')
-    for e in eList:
-        botScores[e] = {}
-    best_value = optimize_variable(args['precision'],args['matches'],eList,
-        args['constant'], args['file'], processes=args['processes'])
-    print(best_value)
+    MATCH_TIMEOUT = args['match_timeout']
+    WORKER_MATCHES = args['worker_matches'] or None
+    profile = rgprofile.BotProfile() if args['profile'] else None
+    metrics = None
+    if args['events'] is not None or args['status'] is not None:
+        metrics = rgprofile.Metrics(args['events'], args['status'])
+    eList, weights = parse_enemies(args['enemies'])
+    if any(w != 1 for w in weights) and not args['sample']:
+        parser.error('enemy weights only apply with --sample')
+    if any(w <= 0 for w in weights):
+        parser.error('enemy weights must be positive')
+    if args['sample'] and args['rating']:
+        parser.error('--sample and --rating can not be used together')
+    if args['rating']:
+        # the encounters of a rating tourney are too short to compare pairs,
+        # cut short, cache or checkpoint
+        for option in ('paired', 'confidence', 'cache', 'checkpoint'):
+            if args[option] not in (None, False):
+                parser.error('--%s can not be used with --rating' % option)
+    cache = None
+    if not args['no_cache']:
+        cache = ResultCache(args['cache'] or 'rgtuner_cache.sqlite')
+    if args['paired'] and args['seed'] is None:
+        args['seed'] = random.randint(0, default_settings.max_seed)
+        print('paired comparisons use seed', args['seed'])
+    if args['paired'] and args['matches'] % 2:
+        # every seed is played in both player orders
+        args['matches'] += 1
+        print('paired comparisons play', args['matches'], 'matches')
+    if args['simulate']:
+        bot = Variant(args['file'], ())
+        seeds = match_seeds(SIMULATOR_CHECKS, args['seed'] or 0)
+        disagreements = verify_simulator([(bot, e) for e in eList], seeds)
+        for bot1, bot2, seed, expected, simulated in disagreements:
+            print('rgsim scored %s vs %s on seed %d as %s, rgkit as %s' %
+                  (bot1, bot2, seed, simulated, expected))
+        if disagreements:
+            print("rgsim disagrees with rgkit, playing with rgkit's Runner")
+        else:
+            SIMULATE = True
+    remote = args['listen'] is not None
+    if remote:
+        if args['authkey'] is None:
+            args['authkey'] = binascii.hexlify(os.urandom(16)).decode()
+            print('rgworker.py processes must connect with --authkey',
+                  args['authkey'])
+        rgremote.serve_jobs(args['listen'], args['authkey'])
+    if args['constant'] == 'ALL':
+        variables = find_constants(args['file'])
+    else:
+        variables = args['constant'].split(',')
+
+    run = {'variables': variables, 'file': args['file'],
+           'enemies': args['enemies'], 'optimizer': args['optimizer']}
+    if args['checkpoint'] is None:
+        args['checkpoint'] = checkpoint_path(run)
+    if args['resume']:
+        if not os.path.exists(args['checkpoint']):
+            parser.error('there is no checkpoint in %s' % args['checkpoint'])
+        checkpoint = Checkpoint.load(args['checkpoint'])
+        if checkpoint.state.get('run') != run:
+            parser.error('%s is the checkpoint of a different run' %
+                         args['checkpoint'])
+    else:
+        if os.path.exists(args['checkpoint']) and not args['force']:
+            parser.error('%s holds the progress of an interrupted run; pass '
+                         '--resume to carry on with it or --force to start '
+                         'over' % args['checkpoint'])
+        checkpoint = Checkpoint(args['checkpoint'], {'run': run})
+        checkpoint.save()
+    sampling = None
+    if args['sample']:
+        sampling = EnemyPool(eList, weights,
+                             checkpoint.state.get('separation'))
+    options = TuneOptions(
+        cache=cache, seed=args['seed'], confidence=args['confidence'],
+        tie_retries=args['tie_retries'], remote=remote, checkpoint=checkpoint,
+        paired=args['paired'], rating=args['rating'], sampling=sampling,
+        profile=profile, metrics=metrics)
+
+    if args['optimizer'] == 'spsa':
+        best_values = optimize_variables(args['precision'], args['matches'],
+            eList, variables, args['file'], args['processes'],
+            args['iterations'], args['batch'], options)
+    else:
+        best_values = checkpoint.state.setdefault('tuned', {})
+        for variable in variables:
+            if variable in best_values:
+                continue
+            if args['optimizer'] == 'surrogate':
+                best_values[variable] = optimize_surrogate(args['precision'],
+                    args['matches'], eList, variable, args['file'],
+                    args['processes'], args['iterations'], args['batch'],
+                    options)
+                checkpoint.save(tuned=best_values, variable=None)
+                continue
+            best_values[variable] = optimize_variable(args['precision'],
+                args['matches'], eList, variable, args['file'],
+                args['processes'], options)
+            checkpoint.save(tuned=best_values, variable=None)
+    checkpoint.remove()
+    if cache is not None:
+        cache.close()
+    for variable in variables:
+        print(variable, best_values[variable])
+    if profile is not None:
+        profile.report()
+    if metrics is not None:
+        metrics.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,70 @@
+#!/usr/bin/env python2
+from __future__ import print_function
+import argparse
+import multiprocessing
+import socket
+import time
+import rgremote
+import rgtuner
+# jobs are pickled by rgtuner.py running as __main__, so its classes have to
+# be found in this one
+from rgtuner import Variant
+
+
+def run_worker(address, authkey, matches=None):
+    """Plays matches for the tuning run at address, waiting for one to start
+    and reconnecting when it ends, until interrupted or until it has played
+    matches of them, if given."""
+    while True:
+        try:
+            rgremote.work(address, authkey, rgtuner.run_remote_job, matches)
+            return
+        except (EOFError, IOError, socket.error):
+            time.sleep(1)
+        except KeyboardInterrupt:
+            return
+
+
+def start_worker(args):
+    worker = multiprocessing.Process(
+        target=run_worker,
+        args=(args['address'], args['authkey'], args['matches'] or None))
+    worker.start()
+    return worker
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play matches for an rgtuner.py run started with --listen.")
+    parser.add_argument(
+        "address", type=str, help='The host:port rgtuner.py is listening on.')
+    parser.add_argument(
+        "-p", "--processes",
+        default=multiprocessing.cpu_count(),
+        type=int, help='The number of processes to simulate in')
+    parser.add_argument(
+        "-a", "--authkey",
+        required=True,
+        type=str, help='The password rgtuner.py was started with, or printed')
+    parser.add_argument(
+        "-m", "--matches",
+        default=rgtuner.WORKER_MATCHES,
+        type=int, help='The number of matches a process plays before it is '
+                       'replaced by a fresh one; 0 for no limit')
+    args = vars(parser.parse_args())
+    workers = [start_worker(args) for i in range(args['processes'])]
+    try:
+        while True:
+            # replace the processes that are done with their matches
+            for i, worker in enumerate(workers):
+                if not worker.is_alive():
+                    worker.join()
+                    workers[i] = start_worker(args)
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,10 @@
+import collections
+import functools
 import rg
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 # globals for fine-tuning
 SPAWN_WEIGHT = 1.0
@@ -33,28 +39,260 @@ NEARBY_TROUBLED_FRIENDLY_ATTACK_WEIGHT = 1.25
 ATTACK_IN_FUTURE_MOVES_WEIGHT = 20.25
 MULTIPLE_ATTACK_WEIGHT = 2.875
 
+# the features of a tile that Robot.get_tile_features() returns. they are
+# summed in this order, which is the order the terms of a tile's goodness have
+# always been added up in: floating point sums depend on it, and a different
+# order can break a tie between two tiles the other way
+TILE_FEATURES = ['SPAWN', 'CANT_EASILY_LEAVE_SPAWN', 'FIGHTING_FRIENDLY',
+                 'TO_FIGHT_FRIENDLY', 'ADJACENT_ENEMIES', 'FRIENDLY_IN_LOC',
+                 'FRIENDLIES_IN_TROUBLE', 'COULD_DIE', 'CENTER', 'REMAIN',
+                 'CHARGE', 'ESCAPE', 'GROUP', 'ENEMY_IN_LOC',
+                 'ENEMY_IN_TROUBLE', 'ENEMY_SUPER_WEAK',
+                 'NEARBY_FRIENDLIES_IN_SPAWN',
+                 'NEARBY_FRIENDLIES_IN_DEEP_SPAWN', 'POSSIBLE_SUICIDERS',
+                 'SURROUND', 'IN_FUTURE_MOVES', 'MOVE_INTO_ATTACK']
+
+# the weights of TILE_FEATURES. if None, they are taken from the constants
+# above; set it to a list of weights to score tiles with those instead
+TILE_WEIGHTS = None
+
+# the features of a location that Robot.get_attack_features() returns, followed
+# by those that Robot.get_planned_attack_goodness() adds
+ATTACK_FEATURES = ['FRIENDLY_LOC', 'ENEMY_HP', 'ADJACENT_ENEMY',
+                   'ADJACENT_FRIENDLY', 'NEARBY_TROUBLED_ENEMY',
+                   'NEARBY_TROUBLED_FRIENDLY']
+PLANNED_ATTACK_FEATURES = ['ATTACK_IN_FUTURE_MOVES', 'MULTIPLE_ATTACK']
+
+# like TILE_WEIGHTS, for ATTACK_FEATURES + PLANNED_ATTACK_FEATURES
+ATTACK_WEIGHTS = None
+
+# build the feature matrix of the candidate tiles of all of our robots with
+# numpy on the first move of a turn and score each robot's tiles from it, and
+# score the locations a robot could attack all at once, instead of one tile at
+# a time. both choose the same moves as the scalar scorers
+USE_NUMPY = False
+
+# the TILE_FEATURES that depend on the moves other robots have planned this
+# turn, which Robot.get_tile_scores() fills in when the robot acts
+PLANNED_TILE_FEATURES = ['TO_FIGHT_FRIENDLY', 'IN_FUTURE_MOVES',
+                         'MOVE_INTO_ATTACK']
+
+
+def tile_weights(turn):
+    """Returns the weights of TILE_FEATURES on a turn. Being in spawn costs
+    50 more on the turns robots spawn."""
+    weights = list(TILE_WEIGHTS) if TILE_WEIGHTS is not None else [
+        SPAWN_WEIGHT, CANT_EASILY_LEAVE_SPAWN_WEIGHT,
+        FIGHTING_FRIENDLY_WEIGHT, TO_FIGHT_FRIENDLY_WEIGHT, -1,
+        FRIENDLY_IN_LOC_WEIGHT, FRIENDLIES_IN_TROUBLE_WEIGHT,
+        COULD_DIE_WEIGHT, 0.01, REMAIN_BIAS, CHARGE_WEIGHT, ESCAPE_WEIGHT,
+        GROUP_WEIGHT, ENEMY_IN_LOC_WEIGHT, ENEMY_IN_TROUBLE_WEIGHT,
+        ENEMY_SUPER_WEAK_WEIGHT, NEARBY_FRIENDLIES_IN_SPAWN_WEIGHT,
+        NEARBY_FRIENDLIES_IN_DEEP_SPAWN_WEIGHT, POSSIBLE_SUICIDERS_WEIGHT,
+        SURROUND_WEIGHT, 999, MOVE_INTO_ATTACK_WEIGHT]
+    weights[0] = (turn % 10 == 0) * 50 + weights[0]
+    return weights
+
+
+def attack_weights():
+    """Returns the weights of ATTACK_FEATURES + PLANNED_ATTACK_FEATURES."""
+    if ATTACK_WEIGHTS is not None:
+        return ATTACK_WEIGHTS
+    return [FRIENDLY_LOC_ATTACK_WEIGHT, ENEMY_ATTACK_HP_WEIGHT,
+            ADJACENT_ENEMY_ATTACK_WEIGHT, ADJACENT_FRIENDLY_ATTACK_WEIGHT,
+            NEARBY_TROUBLED_ENEMY_ATTACK_WEIGHT,
+            NEARBY_TROUBLED_FRIENDLY_ATTACK_WEIGHT,
+            ATTACK_IN_FUTURE_MOVES_WEIGHT, MULTIPLE_ATTACK_WEIGHT]
+
 # global variable to store the future moves of each ally robot
 # we can use this to avoid friendly collisions
 future_moves = []
 future_attacks = []
+# the same squares as bitboards (see map_bit), to check them without scanning
+# the lists
+future_moves_mask = 0
+future_attacks_mask = 0
 # this is used to store the current turn considered by the future_moves array
 future_moves_turn = 0
 
+BOARD_SIZE = 19
+
+# static index of the map, so that the hot loops don't recompute rg.loc_types()
+# and rg.locs_around() for the same squares over and over.
+# it is filled in by index_map() on the first turn, as the map is only known
+# once rgkit has loaded it
+# the squares around each square, as rg.locs_around(loc) returns them
+map_around = {}
+# the same with filter_out=['invalid']
+map_around_board = {}
+# the same with filter_out=['invalid', 'obstacle']
+map_around_walkable = {}
+# the same with filter_out=['spawn', 'obstacle', 'invalid']
+map_around_exits = {}
+# the squares on the board exactly 2 steps away from each square
+map_ring2 = {}
+# the distance of each square to the center
+map_center_dist = {}
+spawn_locs = frozenset()
+# bitboards of the map: an int with bit x * BOARD_SIZE + y set for each square
+# (x, y) in it, so sets of squares can be intersected with a single &
+# the bit of each square
+map_bit = {}
+# the squares around each square, and exactly 2 steps away from it
+map_around_mask = {}
+map_ring2_mask = {}
+
+
+def squares_mask(locs):
+    """Returns the bitboard of a list of squares on the board."""
+    mask = 0
+    for loc in locs:
+        mask |= map_bit[loc]
+    return mask
+
+
+def index_map():
+    """Fills in the static index of the map."""
+    global spawn_locs
+    for x in range(BOARD_SIZE):
+        for y in range(BOARD_SIZE):
+            map_bit[x, y] = 1 << (x * BOARD_SIZE + y)
+    spawn = set()
+    for x in range(BOARD_SIZE):
+        for y in range(BOARD_SIZE):
+            loc = (x, y)
+            if 'spawn' in rg.loc_types(loc):
+                spawn.add(loc)
+            map_around[loc] = rg.locs_around(loc)
+            map_around_board[loc] = rg.locs_around(loc,
+                    filter_out=['invalid'])
+            map_around_walkable[loc] = rg.locs_around(loc,
+                    filter_out=['invalid', 'obstacle'])
+            map_around_exits[loc] = rg.locs_around(loc,
+                    filter_out=['spawn', 'obstacle', 'invalid'])
+            map_center_dist[loc] = rg.dist(loc, rg.CENTER_POINT)
+            map_ring2[loc] = [(x + dx, y + dy)
+                    for dx in range(-2, 3) for dy in range(-2, 3)
+                    if abs(dx) + abs(dy) == 2 and
+                    0 <= x + dx < BOARD_SIZE and 0 <= y + dy < BOARD_SIZE]
+    spawn_locs = frozenset(spawn)
+    for loc in map_bit:
+        map_around_mask[loc] = squares_mask(map_around_board[loc])
+        map_ring2_mask[loc] = squares_mask(map_ring2[loc])
+
+
+# index of the robots on the board this turn, shared by all of our robots.
+# like future_moves, it is rebuilt by index_turn() when the turn changes
+turn_index_turn = None
+# the robots of each player, by location
+turn_bots = {}
+# the robots next to each square, in the order of game['robots']
+turn_next_to = {}
+# the number of robots of each player next to each square
+turn_adjacent_counts = {}
+# the bitboard of the robots of each player
+turn_masks = {}
+# the distances to and locations of the 3 robots of each player closest to
+# each square, closest first
+turn_nearest = {}
+
+
+def index_turn(game):
+    """Rebuilds the index of the robots for this turn."""
+    global turn_index_turn
+    turn_index_turn = game['turn']
+    turn_bots.clear()
+    turn_next_to.clear()
+    turn_adjacent_counts.clear()
+    turn_nearest.clear()
+    turn_masks.clear()
+    for memo in turn_memos:
+        memo.clear()
+    turn_loc_info.clear()
+    turn_tile_rows.clear()
+    turn_tile_matrix.clear()
+
+    for loc, bot in game.get('robots').items():
+        turn_bots.setdefault(bot.player_id, {})[loc] = bot
+        turn_masks[bot.player_id] = \
+                turn_masks.get(bot.player_id, 0) | map_bit[loc]
+        counts = turn_adjacent_counts.setdefault(bot.player_id, {})
+        for around in map_around[loc]:
+            turn_next_to.setdefault(around, []).append(bot)
+            counts[around] = counts.get(around, 0) + 1
+
+    for player_id, bots in turn_bots.items():
+        turn_nearest[player_id] = nearest_field(bots, 3)
+
+
+def nearest_field(locs, k):
+    """Returns the distances to and locations of the k locations out of locs
+    closest to each square of the board, closest first.
+    Works by a breadth-first search from all of locs at once, in which each
+    square keeps the first k distinct locations to reach it."""
+    field = dict((loc, []) for loc in map_around_board)
+    queue = collections.deque((loc, loc, 0) for loc in locs)
+    while queue:
+        square, source, dist = queue.popleft()
+        nearest = field[square]
+        if len(nearest) >= k or any(s == source for d, s in nearest):
+            continue
+        nearest.append((dist, source))
+        for around in map_around_board[square]:
+            queue.append((around, source, dist + 1))
+    return field
+
+
+# results of the predicates below for this turn, one dict per predicate, all
+# cleared by index_turn(), and how many times each predicate was answered from
+# them or computed
+turn_memos = []
+memo_hits = collections.Counter()
+memo_misses = collections.Counter()
+
+
+def memoized_per_turn(key):
+    """Makes a predicate compute its result at most once per turn for the same
+    key(*args)."""
+    def decorate(func):
+        name = func.__name__
+        memo = {}
+        turn_memos.append(memo)
+
+        @functools.wraps(func)
+        def memoized(*args):
+            memo_key = key(*args)
+            if memo_key in memo:
+                memo_hits[name] += 1
+                return memo[memo_key]
+            memo_misses[name] += 1
+            result = memo[memo_key] = func(*args)
+            return result
+        return memoized
+    return decorate
+
+
+def memo_stats():
+    """Returns the (hits, misses) of the per-turn cache of each predicate."""
+    return dict((name, (memo_hits[name], memo_misses[name]))
+                for name in set(memo_hits) | set(memo_misses))
+
 
 def cant_easily_leave_spawn(loc, game):
     """Returns whether a bot would need 2+ moves to exit the spawn area.
     (i.e. the bot is in spawn and all of the locations around it are occupied/
     obstacle/invalid)"""
 
-    if 'spawn' in rg.loc_types(loc):
-        adjacent_locs = rg.locs_around(loc,
-                filter_out=['spawn', 'obstacle', 'invalid'])
+    if loc in spawn_locs:
+        adjacent_locs = map_around_exits[loc]
 
         all_bots = game.get('robots')
 
-        for loc in adjacent_locs:
-            if loc in all_bots:
-                adjacent_locs.remove(loc)
+        # this used to remove the occupied locations from the list while
+        # iterating over it, which skips the location after each one removed,
+        # so only a lone exit could ever be blocked by a bot. keep it that way
+        if len(adjacent_locs) == 1:
+            return adjacent_locs[0] in all_bots
         return (len(adjacent_locs) == 0)
 
     # if the bot is not in spawn, then it can easily leave it
@@ -62,28 +300,30 @@ def cant_easily_leave_spawn(loc, game):
     return False
 
 
+@memoized_per_turn(lambda bot, game: (bot.location, bot.hp, bot.player_id))
 def bot_is_in_trouble(bot, game):
     """Returns whether a bot is in trouble.
     If a bot could die in the next turn, it is in trouble."""
     return could_die_in_loc(bot.hp, bot.location, bot.player_id, game)
 
 
+@memoized_per_turn(lambda hp, loc, player_id, game: (hp, loc, player_id))
 def could_die_in_loc(hp, loc, player_id, game):
     """Returns whether or not a bot could die in a given location,
     based on its hp and player_id.
     Considers the number of enemy bots nearby and whether or not
     the robot is standing on a spawn tile just before more will spawn."""
 
-    adjacent_bots = get_bots_next_to(loc, game)
-    adjacent_enemies = [b for b in adjacent_bots if b.player_id != player_id]
+    adjacent_enemies = len(turn_next_to.get(loc, ())) - \
+            turn_adjacent_counts.get(player_id, {}).get(loc, 0)
 
     # each adjacent enemy can deal up to 10 damage in a turn
-    possible_hp_loss = len(adjacent_enemies) * 10
+    possible_hp_loss = adjacent_enemies * 10
     if possible_hp_loss >= hp:
         # could die if all of the adjacent_enemies attack
         return True
 
-    if 'spawn' in rg.loc_types(loc):
+    if loc in spawn_locs:
         if game['turn'] % 10 == 0:
             # next turn, if we remain on the spawn square, it could die
             return True
@@ -111,23 +351,15 @@ def get_weakest_bot(bots):
 def get_bots_next_to(location, game):
     """Returns all bots next to a location."""
 
-    all_bots = game.get('robots')
-    bots = []
-    for loc in all_bots.keys():
-        if loc in rg.locs_around(location):
-            bots.append(all_bots[loc])
-    return bots
+    return list(turn_next_to.get(location, ()))
 
 
 def get_bot_in_location(location, game):
     """Returns the bot in the given location."""
-    bots = game.get('robots')
-    if location in bots.keys():
-        return bots[location]
-    else:
-        return None
+    return game.get('robots').get(location)
 
 
+@memoized_per_turn(lambda bot, game: (bot.location, bot.hp, bot.player_id))
 def is_possible_suicider(bot, game):
     """Returns whether a bot is a possible suicider based on a kinda
     restrictive algorithm.
@@ -152,6 +384,59 @@ def is_possible_suicider(bot, game):
     return False
 
 
+def score_features(matrix, names, weights):
+    """Returns the goodness of each row of the numpy matrix of features named
+    names against the weights, as an array. The products are added one
+    feature at a time in the order of names, like the scalar scorers add
+    them, so that both come to the same floating point sums."""
+    scores = numpy.zeros(len(matrix))
+    for column, (name, weight) in enumerate(zip(names, weights)):
+        if name == 'POSSIBLE_SUICIDERS':
+            # taken off one suicider at a time, like get_tile_goodness()
+            for i in xrange(int(-matrix[:, column].min())):
+                scores -= (matrix[:, column] <= -(i + 1)) * weight
+        else:
+            scores += matrix[:, column] * weight
+    return scores
+
+
+# the matrix of TILE_FEATURES of the candidate tiles of the robots of each
+# player this turn, by player_id, and the row of each tile in it, by (robot
+# location, tile), both filled in by tile_matrix()
+turn_tile_matrix = {}
+turn_tile_rows = {}
+
+
+def tile_matrix(player_id, game):
+    """Returns the feature matrix of every tile each robot of player_id could
+    move to or stay on this turn, and the row of each by (robot location,
+    tile). The first call of a turn builds it for all of them at once; the
+    PLANNED_TILE_FEATURES are left at 0."""
+    if player_id not in turn_tile_matrix:
+        features = []
+        robot = Robot()
+        for bot in turn_bots.get(player_id, {}).values():
+            robot.location = bot.location
+            robot.hp = bot.hp
+            robot.player_id = bot.player_id
+            for loc in [bot.location] + map_around_walkable[bot.location]:
+                turn_tile_rows[(bot.location, loc)] = len(features)
+                features.append(robot.get_tile_features(loc, game,
+                                                        planned=False))
+        turn_tile_matrix[player_id] = numpy.array(features, dtype=float)
+    return turn_tile_matrix[player_id], turn_tile_rows
+
+
+# what is around a location, as seen by one of our robots
+LocInfo = collections.namedtuple('LocInfo', [
+    'bot', 'enemies', 'friendlies', 'enemies_in_trouble',
+    'friendlies_in_trouble'])
+
+# the LocInfo of the locations our robots looked at this turn, by (robot
+# location, location), filled in by Robot.get_loc_info()
+turn_loc_info = {}
+
+
 class Robot:
 
     def sort_bots_closest_first(self, bots):
@@ -162,7 +447,7 @@ class Robot:
         """Returns the enemy bots next to a location."""
         enemies = []
 
-        for loc in rg.locs_around(location):
+        for loc in map_around[location]:
             bot = get_bot_in_location(loc, game)
             if (bot) and (bot.player_id != self.player_id):
                 enemies.append(bot)
@@ -175,7 +460,7 @@ class Robot:
         location is equal to this robot's location)"""
         friendlies = []
 
-        for loc in rg.locs_around(location):
+        for loc in map_around[location]:
             bot = get_bot_in_location(loc, game)
             if (bot) and (bot.player_id == self.player_id):
                 if bot.location != self.location:
@@ -195,8 +480,7 @@ class Robot:
         if (sum([min(bot.hp, 15) for bot in adjacent_bots]) > self.hp):
 
             # see if the bot can escape to any adjacent location
-            for loc in rg.locs_around(self.location,
-                    filter_out=['invalid', 'obstacle']):
+            for loc in map_around_walkable[self.location]:
                 # the bot can't escape to the location if there's an enemy in it
                 if not could_die_in_loc(self.hp, loc, self.player_id, game):
                     bot_in_loc = get_bot_in_location(loc, game)
@@ -212,16 +496,17 @@ class Robot:
         this robot's location) to the nearest enemy."""
         if not loc:
             loc = self.location
-        bots = game.get('robots')
         shortest_distance = 99999
 
-        for bot in bots.values():
-            if bot.location != loc and bot.location != self.location:
-                if ((friendly is False) and (enemy is False)) or \
-                        (enemy and (bot.player_id != self.player_id)) or \
-                        (friendly and (bot.player_id == self.player_id)):
-                    dist = rg.wdist(loc, bot.location)
-                    shortest_distance = min(dist, shortest_distance)
+        for player_id, field in turn_nearest.items():
+            if ((friendly is False) and (enemy is False)) or \
+                    (enemy and (player_id != self.player_id)) or \
+                    (friendly and (player_id == self.player_id)):
+                # the 3 closest are enough to skip loc and our own location
+                for dist, bot_loc in field[loc]:
+                    if bot_loc != loc and bot_loc != self.location:
+                        shortest_distance = min(dist, shortest_distance)
+                        break
         return shortest_distance
 
     def act(self, game):
@@ -233,42 +518,54 @@ class Robot:
         # update the future_moves array if necessary
         # only the first robot will do this
         global future_moves_turn, future_moves, future_attacks
+        global future_moves_mask, future_attacks_mask
+        if not map_around:
+            index_map()
+        if turn_index_turn != game['turn']:
+            index_turn(game)
         if future_moves_turn != game['turn']:
             future_moves = []
             future_attacks = []
+            future_moves_mask = future_attacks_mask = 0
             future_moves_turn = game['turn']
 
         #adjacent_bots = self.get_adjacent_enemy_bots(game)
         if self.is_suiciding_beneficial(game):
             action = ['suicide']
         else:
-            locs = [self.location] + rg.locs_around(self.location,
-                    filter_out=['invalid', 'obstacle'])
+            locs = [self.location] + map_around_walkable[self.location]
             target_loc = self.get_best_loc(locs, game)
             if target_loc != self.location:
                 action = ['move', target_loc]
             else:
-                attack_locs = rg.locs_around(self.location,
-                        filter_out=['invalid', 'obstacle'])
+                attack_locs = map_around_walkable[self.location]
                 action = ['attack', self.get_best_attack_loc(attack_locs, game)]
 
         if action[0] == 'move':
-            assert not action[1] in future_moves
+            assert not future_moves_mask & map_bit[action[1]]
             future_moves.append(action[1])
+            future_moves_mask |= map_bit[action[1]]
             if action[1] == self.location:
                 action = ['guard']
         if action[0] == 'attack':
             future_attacks.append(action[1])
+            future_attacks_mask |= map_bit[action[1]]
 
         return action
 
     def get_best_loc(self, locs, game):
         """Returns the best location out of a list.
-        The 'goodness' of a tile is determined by get_tile_goodness()."""
+        The 'goodness' of a tile is determined by get_tile_goodness(), or by
+        get_tile_scores() if USE_NUMPY is set."""
+        if USE_NUMPY:
+            scores = self.get_tile_scores(locs, game)
         best_loc_weight = -9999
         best_loc = None
-        for loc in locs:
-            loc_weight = self.get_tile_goodness(loc, game)
+        for i, loc in enumerate(locs):
+            if USE_NUMPY:
+                loc_weight = scores[i]
+            else:
+                loc_weight = self.get_tile_goodness(loc, game)
             if loc_weight > best_loc_weight:
                 best_loc = loc
                 best_loc_weight = loc_weight
@@ -285,38 +582,50 @@ class Robot:
     def get_enemies_to_fight_friendlies(self, enemies):
         enemies_to_fight_friendlies = []
         for enemy in enemies:
-            for pos in rg.locs_around(enemy.location):
-                if pos in future_moves:
-                    enemies_to_fight_friendlies.append(enemy)
-                    break
+            if map_around_mask[enemy.location] & future_moves_mask:
+                enemies_to_fight_friendlies.append(enemy)
         return enemies_to_fight_friendlies
 
-    def get_tile_goodness(self, loc, game):
-        """Returns how 'good' a tile is to move to or stay on.
-        Based on a whole bunch of factors. Fine-tuning necessary."""
-
-        types = rg.loc_types(loc)
-        enemies_next_to_loc = self.get_enemy_bots_next_to(loc, game)
+    def get_loc_info(self, loc, game):
+        """Returns the LocInfo of a location. Both the tile and the attack
+        scorers use it, so it is only worked out once per turn."""
+        key = (self.location, loc)
+        info = turn_loc_info.get(key)
+        if info is None:
+            enemies = self.get_enemy_bots_next_to(loc, game)
+            friendlies = self.get_friendlies_next_to(loc, game)
+            info = turn_loc_info[key] = LocInfo(
+                get_bot_in_location(loc, game), enemies, friendlies,
+                [enemy for enemy in enemies if bot_is_in_trouble(enemy, game)],
+                [friendly for friendly in friendlies
+                 if bot_is_in_trouble(friendly, game)])
+        return info
+
+    def get_tile_features(self, loc, game, planned=True):
+        """Returns the features of a tile, in the order of TILE_FEATURES.
+        Its goodness is the sum of the features times tile_weights().
+        If planned is false, the PLANNED_TILE_FEATURES are left at 0."""
+
+        in_spawn = loc in spawn_locs
+        info = self.get_loc_info(loc, game)
+        enemies_next_to_loc = info.enemies
         enemies_next_to_loc_fighting_friendlies = \
                 self.get_enemies_fighting_friendlies(
                         enemies_next_to_loc, game)
 
-        enemies_next_to_loc_to_fight_friendlies = \
-                self.get_enemies_to_fight_friendlies(enemies_next_to_loc)
-
-        friendlies_next_to_loc = self.get_friendlies_next_to(loc, game)
+        friendlies_next_to_loc = info.friendlies
 
         nearby_friendlies_in_spawn = []
         nearby_friendlies_in_deep_spawn = []
         for friendly in friendlies_next_to_loc:
-            if 'spawn' in rg.loc_types(friendly.location):
+            if friendly.location in spawn_locs:
                 nearby_friendlies_in_spawn.append(friendly)
                 if cant_easily_leave_spawn(friendly.location, game):
                     nearby_friendlies_in_deep_spawn.append(friendly)
 
         friendly_in_loc = enemy_in_loc = False
         if loc != self.location:
-            bot_in_location = get_bot_in_location(loc, game)
+            bot_in_location = info.bot
             if bot_in_location:
                 if bot_in_location.player_id == self.player_id:
                     friendly_in_loc = True
@@ -331,40 +640,40 @@ class Robot:
         distance_to_closest_friendly = self.get_distance_to_closest_bot(game,
                 loc=loc, friendly=True)
 
-        nearby_friendlies_in_trouble = []
-        for friendly in friendlies_next_to_loc:
-            if bot_is_in_trouble(friendly, game):
-                nearby_friendlies_in_trouble.append(friendly)
+        nearby_friendlies_in_trouble = info.friendlies_in_trouble
 
-        goodness = 0
+        spawning = game['turn'] <= 90
 
         # get out of spawn areas, especially if things are about to spawn
         # highest priority: -50 pts if things are about to spawn
-        if game['turn'] <= 90:
-            goodness -= ('spawn' in types) * ((game['turn'] % 10 == 0) * 50 + SPAWN_WEIGHT)
+        # (tile_weights() adds those to the weight of spawn)
+        spawn = -(spawning and in_spawn)
 
         # if the bot can't easily leave spawn (e.g. has to move through
         # more spawn area or an enemy to get out) in the location, that's bad
         # the closer to the spawn timer we are, the worse this is, so
         # multiply it by the game turn % 10
-        if game['turn'] <= 90:
-            goodness -= cant_easily_leave_spawn(loc, game) * (
-                    game['turn'] % 10) * CANT_EASILY_LEAVE_SPAWN_WEIGHT
+        cant_easily_leave = 0
+        if spawning:
+            cant_easily_leave = -(cant_easily_leave_spawn(loc, game) *
+                    (game['turn'] % 10))
 
-        # if enemies next to the location are fighting or will fight
-        # other friendlies, help them
-        goodness += len(enemies_next_to_loc_fighting_friendlies) * FIGHTING_FRIENDLY_WEIGHT
+        # if enemies next to the location are fighting other friendlies,
+        # help them
+        fighting_friendly = len(enemies_next_to_loc_fighting_friendlies)
 
-        goodness += len(enemies_next_to_loc_to_fight_friendlies) * TO_FIGHT_FRIENDLY_WEIGHT
+        to_fight_friendly = in_future_moves = move_into_attack = 0
+        if planned:
+            to_fight_friendly, in_future_moves, move_into_attack = \
+                    self.get_planned_tile_features(loc, game)
 
         # more enemies next to a location, the worse.
         # even worse if a friendly is already in the location
         #    (so the enemies will target that loc)
         # even worse if our hp is low
         # so exponential because of exponential badness I think
-        goodness -= (len(enemies_next_to_loc) * ADJACENT_ENEMIES_WEIGHT) ** ADJACENT_ENEMIES_EXPONENT
-
-        goodness -= friendly_in_loc * FRIENDLY_IN_LOC_WEIGHT
+        adjacent_enemies = (len(enemies_next_to_loc) *
+                ADJACENT_ENEMIES_WEIGHT) ** ADJACENT_ENEMIES_EXPONENT
 
         # slight bias towards NOT moving right next to friendlies
         # a sort of lattice, like
@@ -375,112 +684,147 @@ class Robot:
         #goodness -= len(friendlies_next_to_loc) * 0.05
 
         # nearby friendlies in trouble will definitely want to escape this turn
-        goodness -= len(nearby_friendlies_in_trouble) * FRIENDLIES_IN_TROUBLE_WEIGHT
+        friendlies_in_trouble = -len(nearby_friendlies_in_trouble)
 
-        if could_die_in_loc(self.hp, loc, self.player_id, game):
-            # /try/ not to go where the bot can die
-            # seriously
-            goodness -= COULD_DIE_WEIGHT
+        # /try/ not to go where the bot can die
+        # seriously
+        could_die = -could_die_in_loc(self.hp, loc, self.player_id, game)
 
         # all else remaining the same, move towards the center
-        goodness -= rg.dist(loc, rg.CENTER_POINT) * 0.01
+        center = -map_center_dist[loc]
 
         # bias towards remaining in place and attacking
-        goodness += (loc == self.location) * REMAIN_BIAS
+        remain = (loc == self.location)
         # especailly if we're only fighting one bot
 
+        charge = escape = 0
         if self.hp > 15:
             # if we are strong enough, move close to (2 squares away) the
             #nearest enemy
-            goodness -= max(distance_to_closest_enemy, 2) * CHARGE_WEIGHT
+            charge = -max(distance_to_closest_enemy, 2)
         else:
             #otherwise, run away from the nearest enemy, up to 2 squares away
-            goodness += min(distance_to_closest_enemy, 2) * ESCAPE_WEIGHT
+            escape = min(distance_to_closest_enemy, 2)
 
         # friendlies should group together
         # if a bot is caught alone, bots that actively hunt and surround,
         # e.g. Chaos Witch Quelaang, will murder them
         # so move up to two tiles from the nearest friendly
-        goodness -= min(distance_to_closest_friendly, 2) * GROUP_WEIGHT
+        group = -min(distance_to_closest_friendly, 2)
 
         # don't move into an enemy
         # it's slightly more ok to move into an enemy that could die in the
         # next turn by staying here, cause he's likely to either run or die
         # it's perfectly alright, maybe even encouraged, to move into a bot
         # that would die from bumping into you anyways (<=5hp)
+        enemy_in_trouble = enemy_super_weak = False
         if enemy_in_loc:
-            goodness -= enemy_in_loc * ENEMY_IN_LOC_WEIGHT
-            goodness += (bot_is_in_trouble(bot_in_location, game) *
-                    ENEMY_IN_TROUBLE_WEIGHT)
-            goodness += ENEMY_SUPER_WEAK_WEIGHT * (bot_in_location.hp <= 5)
+            enemy_in_trouble = bot_is_in_trouble(bot_in_location, game)
+            enemy_super_weak = bot_in_location.hp <= 5
 
         # don't block friendlies trying to move out of spawn!
         # only matters when things will still spawn in the future, of course
-        if game['turn'] <= 90:
+        friendlies_in_spawn = friendlies_in_deep_spawn = 0
+        if spawning:
             # if they can escape through us
-            if not 'spawn' in types:
-                goodness -= len(nearby_friendlies_in_spawn) * \
-                        NEARBY_FRIENDLIES_IN_SPAWN_WEIGHT
+            if not in_spawn:
+                friendlies_in_spawn = -len(nearby_friendlies_in_spawn)
             #especially don't block those who can't easily leave spawn
             # (the two lists overlap, so no extra weighting needed)
-            goodness -= len(nearby_friendlies_in_deep_spawn) * \
-                    NEARBY_FRIENDLIES_IN_DEEP_SPAWN_WEIGHT
+            friendlies_in_deep_spawn = -len(nearby_friendlies_in_deep_spawn)
 
         # don't move next to possible suiciders if our hp is low enough to die
         # from them
-        for enemy in enemies_next_to_loc_fighting_friendlies:
-            if is_possible_suicider(enemy, game) and (self.hp <= 15):
-                goodness -= POSSIBLE_SUICIDERS_WEIGHT
+        possible_suiciders = 0
+        if self.hp <= 15:
+            for enemy in enemies_next_to_loc_fighting_friendlies:
+                if is_possible_suicider(enemy, game):
+                    possible_suiciders -= 1
 
         # the more enemies that could move next to the loc, the worse
         # (the more this bot could be surrounded)
-        goodness -= min(len(self.get_enemies_that_could_move_next_to(
-            loc, game)), 1) * SURROUND_WEIGHT
+        surround = -bool(map_ring2_mask[loc] & self.get_enemies_mask())
+
+        return [spawn, cant_easily_leave, fighting_friendly, to_fight_friendly,
+                adjacent_enemies, -friendly_in_loc, friendlies_in_trouble,
+                could_die, center, remain, charge, escape, group,
+                -enemy_in_loc, enemy_in_trouble, enemy_super_weak,
+                friendlies_in_spawn, friendlies_in_deep_spawn,
+                possible_suiciders, surround, in_future_moves,
+                move_into_attack]
+
+    def get_planned_tile_features(self, loc, game):
+        """Returns the PLANNED_TILE_FEATURES of a tile, which depend on the
+        moves and attacks other robots have planned this turn."""
+
+        # if enemies next to the location will fight other friendlies, help
+        # them
+        to_fight_friendly = len(self.get_enemies_to_fight_friendlies(
+            self.get_loc_info(loc, game).enemies))
 
         # DON'T move into a square if another bot already plans to move there
-        goodness -= 999 * (loc in future_moves)
+        in_future_moves = -bool(future_moves_mask & map_bit[loc])
 
         #allies attacking the same spot is bad, but not the end of the world..
         # e.g. if a robot needs to go through a spot being attacked by an
         # ally to leave spawn, he DEFINITELY still needs to move there
-        goodness -= MOVE_INTO_ATTACK_WEIGHT * (loc in future_attacks)
+        move_into_attack = -bool(future_attacks_mask & map_bit[loc])
 
-        return goodness
+        return [to_fight_friendly, in_future_moves, move_into_attack]
 
-    def get_enemies_that_could_move_next_to(self, loc, game):
-        enemies = []
-        for bot in game.get('robots').values():
-            if bot.player_id != self.player_id:
-                if rg.wdist(bot.location, loc) == 2:
-                    enemies.append(bot)
-        return enemies
+    def get_tile_scores(self, locs, game):
+        """Returns the goodness of each of a list of tiles, scored with numpy
+        from this robot's rows of tile_matrix()."""
+        matrix, rows = tile_matrix(self.player_id, game)
+        matrix = matrix[[rows[(self.location, loc)] for loc in locs]]
+        columns = [TILE_FEATURES.index(name) for name in PLANNED_TILE_FEATURES]
+        for i, loc in enumerate(locs):
+            matrix[i, columns] = self.get_planned_tile_features(loc, game)
+        return score_features(matrix, TILE_FEATURES,
+                              tile_weights(game['turn'])).tolist()
 
-    def get_attack_goodness(self, loc, game):
-        """Returns how 'good' attacking a certain location is.
+    def get_tile_goodness(self, loc, game):
+        """Returns how 'good' a tile is to move to or stay on.
+        Based on a whole bunch of factors. Fine-tuning necessary."""
+        goodness = 0
+        for name, feature, weight in zip(TILE_FEATURES,
+                                         self.get_tile_features(loc, game),
+                                         tile_weights(game['turn'])):
+            if name == 'POSSIBLE_SUICIDERS':
+                # taken off one suicider at a time, as it always was
+                for i in xrange(-feature):
+                    goodness -= weight
+            else:
+                goodness += feature * weight
+        return goodness
+
+    def get_enemies_mask(self):
+        """Returns the bitboard of the enemy robots this turn."""
+        mask = 0
+        for player_id, player_mask in turn_masks.items():
+            if player_id != self.player_id:
+                mask |= player_mask
+        return mask
+
+    def get_attack_features(self, loc, game):
+        """Returns the features of attacking a location that don't depend on
+        the moves other robots have planned this turn, in the order of
+        ATTACK_FEATURES.
         Based upon the number of friendlies and enemies next to the location,
         any bot that is in the location, etc."""
-        enemies_next_to_loc = self.get_enemy_bots_next_to(loc, game)
-        friendlies_next_to_loc = self.get_friendlies_next_to(loc, game)
-        nearby_friendlies_in_trouble = []
-        for friendly in friendlies_next_to_loc:
-            if bot_is_in_trouble(friendly, game):
-                nearby_friendlies_in_trouble.append(friendly)
-        nearby_enemies_in_trouble = []
-        for enemy in enemies_next_to_loc:
-            if bot_is_in_trouble(enemy, game):
-                nearby_enemies_in_trouble.append(enemy)
-        robot = get_bot_in_location(loc, game)
+        info = self.get_loc_info(loc, game)
+        robot = info.bot
 
-        goodness = 0
+        features = [0] * len(ATTACK_FEATURES)
 
         if robot:
             if robot.player_id == self.player_id:
                 # we're attacking a friendly's location
                 # no enemy's gonna move into them...
-                goodness -= FRIENDLY_LOC_ATTACK_WEIGHT
+                features[0] = -1
             else:
                 #attacking an enemy is good
-                goodness += (100 - robot.hp) * ENEMY_ATTACK_HP_WEIGHT
+                features[1] = 100 - robot.hp
         else:
 
             # no bot is at the location
@@ -490,38 +834,61 @@ class Robot:
             # weighted by 3 because even if there are two other friendlies
             # next to the loc, we still want to attack if it's the only square
             # an enemy is next to
-            goodness += len(enemies_next_to_loc) * ADJACENT_ENEMY_ATTACK_WEIGHT
+            features[2] = len(info.enemies)
 
             #enemies aren't too likely to move next to a friendly
-            goodness -= len(friendlies_next_to_loc) * \
-                    ADJACENT_FRIENDLY_ATTACK_WEIGHT
+            features[3] = -len(info.friendlies)
 
             # if there are enemies in trouble nearby, we want to try and catch
             # them escaping!
-            goodness += len(nearby_enemies_in_trouble) * \
-                    NEARBY_TROUBLED_ENEMY_ATTACK_WEIGHT
+            features[4] = len(info.enemies_in_trouble)
 
             # nearby friendlies in trouble will definitely want to escape this
             # turn
             # maybe to this square
-            goodness -= len(nearby_friendlies_in_trouble) * \
-                    NEARBY_TROUBLED_FRIENDLY_ATTACK_WEIGHT
-
+            features[5] = -len(info.friendlies_in_trouble)
+        return features
+
+    def get_planned_attack_goodness(self, goodness, loc, game):
+        """Adds the part of the goodness of attacking a location that depends
+        on the moves and attacks other robots have planned this turn to the
+        goodness of its other features, and returns it."""
+        if not self.get_loc_info(loc, game).bot:
+            weights = attack_weights()[len(ATTACK_FEATURES):]
             # don't attack where an ally is already moving to
             # or attacking, at least not too much
-            if loc in future_moves:
-                goodness -= ATTACK_IN_FUTURE_MOVES_WEIGHT
-            elif loc in future_attacks:
-                goodness -=  MULTIPLE_ATTACK_WEIGHT
+            if future_moves_mask & map_bit[loc]:
+                goodness -= weights[0]
+            elif future_attacks_mask & map_bit[loc]:
+                goodness -= weights[1]
         return goodness
 
+    def get_attack_goodness(self, loc, game):
+        """Returns how 'good' attacking a certain location is."""
+        goodness = 0
+        for feature, weight in zip(self.get_attack_features(loc, game),
+                                   attack_weights()):
+            goodness += feature * weight
+        return self.get_planned_attack_goodness(goodness, loc, game)
+
     def get_best_attack_loc(self, locs, game):
         """Determines the best location to attack out of a list of locations.
-        Uses get_attack_goodness() to weigh the locations."""
+        Uses get_attack_goodness() to weigh the locations, or scores them all
+        at once with score_features() if USE_NUMPY is set."""
+        if USE_NUMPY:
+            matrix = numpy.array([self.get_attack_features(loc, game)
+                                  for loc in locs], dtype=float)
+            scores = score_features(
+                matrix.reshape(len(locs), len(ATTACK_FEATURES)),
+                ATTACK_FEATURES, attack_weights()).tolist()
         best_loc_weight = -9999
         best_loc = None
-        for loc in locs:
-            loc_weight = self.get_attack_goodness(loc, game)
+        for i, loc in enumerate(locs):
+            if USE_NUMPY:
+                loc_weight = self.get_planned_attack_goodness(
+                    scores[i], loc, game)
+            else:
+                loc_weight = self.get_attack_goodness(loc, game)
             if loc_weight > best_loc_weight:
                 best_loc = loc
                 best_loc_weight = loc_weight
@@ -0,0 +1,126 @@
+from __future__ import print_function
+import collections
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import rgremote
+
+try:
+    import rgkit
+except ImportError:
+    rgkit = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# a stand-in for an rgtuner Variant, which RemotePool sends the source of
+Bot = collections.namedtuple('Bot', 'robot_file')
+
+
+def free_address():
+    """Returns a 'localhost:port' address nothing listens on."""
+    s = socket.socket()
+    s.bind(('localhost', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return 'localhost:%d' % port
+
+
+def double_matches(job):
+    """A job function, which only lends RemotePool its name."""
+
+
+def play(func_name, job, sources):
+    """Plays a job of the tests: doubles the index of each of its matches."""
+    if func_name != 'double_matches':
+        raise ValueError(func_name)
+    pairing, matches, bot = job
+    return (pairing, [index * 2 for index, seed, swap in matches],
+            sources[bot.robot_file], os.getpid())
+
+
+class RemotePoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.address = free_address()
+        rgremote.serve_jobs(self.address, 'secret')
+        self.tmp = tempfile.mkdtemp()
+        self.bot = Bot(os.path.join(self.tmp, 'bot.py'))
+        with open(self.bot.robot_file, 'w') as f:
+            f.write('X = 1.0\n')
+        self.workers = []
+
+    def tearDown(self):
+        for worker in self.workers:
+            worker.terminate()
+            worker.join()
+        shutil.rmtree(self.tmp)
+        # let the server give up on the jobs the workers were waiting for
+        time.sleep(2 * rgremote.JOB_POLL)
+
+    def start_workers(self, count, authkey='secret'):
+        for i in xrange(count):
+            worker = multiprocessing.Process(
+                target=rgremote.work, args=(self.address, authkey, play))
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+    def test_workers_play_every_job(self):
+        self.start_workers(2)
+        pool = rgremote.RemotePool(2)
+        jobs = [(i, [(i, None, False), (i + 10, None, False)], self.bot)
+                for i in xrange(8)]
+        results = pool.imap_unordered(double_matches, jobs)
+        played = [results.next(timeout=30) for job in jobs]
+        self.assertEqual(sorted(r[:3] for r in played),
+                         [(i, [i * 2, i * 2 + 20], 'X = 1.0\n')
+                          for i in xrange(8)])
+        self.assertTrue(set(r[3] for r in played) <=
+                        set(w.pid for w in self.workers))
+
+    def test_failed_job_is_raised(self):
+        self.start_workers(1)
+        pool = rgremote.RemotePool(1)
+        results = pool.imap_unordered(play, [(0, [(0, None, False)],
+                                              self.bot)])
+        self.assertRaises(RuntimeError, results.next, 30)
+
+    def test_wrong_authkey_is_refused(self):
+        self.assertRaises(multiprocessing.AuthenticationError,
+                          rgremote.work, self.address, 'guess', play)
+
+
+@unittest.skipIf(rgkit is None, 'rgkit is not installed')
+class WorkerProcessTest(unittest.TestCase):
+
+    def test_rgworker_plays_the_matches_of_a_run(self):
+        address = free_address()
+        rgremote.serve_jobs(address, 'secret')
+        import rgtuner
+        bot = rgtuner.Variant(os.path.join(ROOT, 'sbase.py'), ())
+        # in a process group of its own, so that ctrl+c can be sent to its
+        # processes as it would from a terminal
+        worker = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, 'rgworker.py'), address,
+             '-p', '2', '-a', 'secret'], cwd=ROOT, preexec_fn=os.setsid)
+        try:
+            pool = rgtuner.make_pool(2, bot.robot_file, [bot], remote=True)
+            score = rgtuner.versus(2, bot, bot, pool, seed=1)
+        finally:
+            os.killpg(worker.pid, signal.SIGINT)
+            worker.wait()
+        local = rgtuner.make_pool(2, bot.robot_file, [bot])
+        self.assertEqual(score, rgtuner.versus(2, bot, bot, local, seed=1))
+        local.close()
+        local.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+from __future__ import print_function
+import os
+import unittest
+
+try:
+    import rgkit
+except ImportError:
+    rgkit = None
+
+try:
+    from rgkit.game import Game, Player
+    from rgkit.settings import settings
+except ImportError:
+    Game = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the seeds the games of rgkit and rgsim are compared on
+SEEDS = [1, 2, 3, 42, 1234]
+
+
+def board(robots):
+    """Returns the player and hit points of each robot of a board, by
+    location."""
+    return dict((loc, (robot['player_id'], robot['hp']))
+                for loc, robot in robots.items())
+
+
+class Scripted(object):
+    """A player whose robots take the actions in actions, by location, and
+    guard anywhere else."""
+
+    def __init__(self, actions):
+        self.actions = actions
+
+    def act(self, game):
+        return self.actions.get(self.location, ['guard'])
+
+
+@unittest.skipIf(rgkit is None, 'rgkit is not installed')
+class SimulatorTest(unittest.TestCase):
+
+    def setUp(self):
+        import rgsim
+        from rgkit.settings import settings
+        self.settings = settings
+        rgsim.load_map()
+        self.rgsim = rgsim
+
+    def play(self, robots, actions1, actions2, turn=1):
+        """Plays one turn, which is not a spawn turn by default, from the
+        board robots, a {loc: (player_id, hp)} dict. Returns the board after
+        it, in the same form."""
+        game = self.rgsim.Game([Scripted(actions1), Scripted(actions2)], 1)
+        game.turn = turn
+        for robot_id, (loc, (player_id, hp)) in enumerate(robots.items()):
+            game.robots[loc] = {'hp': hp, 'player_id': player_id,
+                                'robot_id': robot_id}
+        game.run_turn()
+        return dict((loc, (robot['player_id'], robot['hp']))
+                    for loc, robot in game.robots.items())
+
+    def test_robots_spawn_on_spawn_turns(self):
+        board = self.play({}, {}, {}, turn=0)
+        for player_id in (0, 1):
+            self.assertEqual(sorted(hp for p, hp in board.values()
+                                    if p == player_id),
+                             [self.settings.robot_hp] *
+                             self.settings.spawn_per_player)
+        self.assertTrue(all(loc in self.settings.spawn_coords
+                            for loc in board))
+
+    def test_attacks_and_guarding(self):
+        low, high = self.settings.attack_range
+        board = self.play({(9, 9): (0, 50), (9, 10): (1, 50)},
+                          {(9, 9): ['attack', (9, 10)]}, {})
+        self.assertEqual(board[(9, 9)], (0, 50))
+        # the target guarded, which halves the damage
+        self.assertTrue(50 - high // 2 <= board[(9, 10)][1] <= 50 - low // 2)
+        board = self.play({(9, 9): (0, 50), (9, 10): (1, 50)},
+                          {(9, 9): ['attack', (9, 10)]},
+                          {(9, 10): ['move', (10, 10)]})
+        self.assertEqual(board[(9, 9)], (0, 50))
+        # the target moved away from the attack
+        self.assertEqual(board[(10, 10)], (1, 50))
+
+    def test_robots_die_and_suicide(self):
+        board = self.play({(9, 9): (0, 50), (9, 10): (1, 1)},
+                          {(9, 9): ['attack', (9, 10)]},
+                          {(9, 10): ['move', (10, 10)]})
+        self.assertEqual(board, {(9, 9): (0, 50), (10, 10): (1, 50 - 49)})
+        board = self.play({(9, 9): (0, 50), (9, 10): (1, 50)},
+                          {(9, 9): ['suicide']}, {})
+        self.assertEqual(board, {(9, 10): (
+            1, 50 - self.settings.suicide_damage // 2)})
+
+    def test_collisions(self):
+        damage = self.settings.collision_damage
+        # both move into the same square: neither does, and each is hurt
+        board = self.play({(9, 8): (0, 50), (9, 10): (1, 50)},
+                          {(9, 8): ['move', (9, 9)]},
+                          {(9, 10): ['move', (9, 9)]})
+        self.assertEqual(board, {(9, 8): (0, 50 - damage),
+                                 (9, 10): (1, 50 - damage)})
+        # and so are the robots behind them
+        board = self.play({(9, 7): (0, 50), (9, 8): (0, 50), (9, 10): (1, 50)},
+                          {(9, 7): ['move', (9, 8)], (9, 8): ['move', (9, 9)]},
+                          {(9, 10): ['move', (9, 9)]})
+        self.assertEqual(board, {(9, 7): (0, 50), (9, 8): (0, 50 - damage),
+                                 (9, 10): (1, 50 - damage)})
+        # a robot bumping into a friend isn't hurt
+        board = self.play({(9, 8): (0, 50), (9, 9): (0, 50)},
+                          {(9, 8): ['move', (9, 9)]}, {})
+        self.assertEqual(board, {(9, 8): (0, 50), (9, 9): (0, 50)})
+        # swapping squares isn't allowed either
+        board = self.play({(9, 9): (0, 50), (9, 10): (1, 50)},
+                          {(9, 9): ['move', (9, 10)]},
+                          {(9, 10): ['move', (9, 9)]})
+        self.assertEqual(board, {(9, 9): (0, 50 - damage),
+                                 (9, 10): (1, 50 - damage)})
+
+    def test_invalid_actions_guard(self):
+        board = self.play({(9, 9): (0, 50), (9, 10): (1, 50)},
+                          {(9, 9): ['move', (12, 12)]},
+                          {(9, 10): ['attack', (9, 9)]})
+        self.assertEqual(board[(9, 10)], (1, 50))
+        self.assertTrue(board[(9, 9)][1] > 50 - self.settings.attack_range[1])
+
+
+@unittest.skipIf(Game is None, 'rgkit is not installed')
+class HistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        import rgsim
+        import rgtuner
+        self.rgsim = rgsim
+        self.rgtuner = rgtuner
+        rgsim.load_map()
+        self.bots = [rgtuner.Variant(os.path.join(ROOT, 'sbase.py'), ()),
+                     rgtuner.Variant(os.path.join(ROOT, 'sbase.py'),
+                                     (('SURROUND_WEIGHT', 2.0),))]
+
+    def robots(self):
+        return [self.rgtuner.load_bot(bot, slot).Robot()
+                for slot, bot in enumerate(self.bots)]
+
+    def test_rgsim_plays_the_games_rgkit_does(self):
+        for seed in SEEDS:
+            game = Game([Player(robot=robot) for robot in self.robots()],
+                        record_history=True, seed=seed)
+            game.run_all_turns()
+            expected = [board(game.get_state(turn).robots)
+                        for turn in xrange(settings.max_turns + 1)]
+            simulated = self.rgsim.Game(self.robots(), seed,
+                                        record_history=True)
+            simulated.run()
+            self.assertEqual([board(robots) for robots in simulated.history],
+                             expected, 'seed %d' % seed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,343 @@
+from __future__ import print_function
+import collections
+import math
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import rgkit
+except ImportError:
+    rgkit = None
+
+if rgkit is not None:
+    import rgtuner
+
+
+@unittest.skipIf(rgkit is None, 'rgkit is not installed')
+class SurrogateTest(unittest.TestCase):
+
+    def test_fit_of_a_quadratic_is_exact(self):
+        fit = rgtuner.QuadraticFit([(x, 3 - 2 * x + 0.5 * x * x)
+                                    for x in (-2, -1, 0, 1, 2, 3)])
+        for x in (-1.5, 0.25, 1.7, 5):
+            self.assertAlmostEqual(fit.mean(x), 3 - 2 * x + 0.5 * x * x)
+            self.assertAlmostEqual(fit.deviation(x), 0)
+
+    def test_fit_is_least_sure_far_from_the_observations(self):
+        fit = rgtuner.QuadraticFit([(0, 1), (0, -1), (1, 2), (1, 0), (2, 1),
+                                    (2, -1)])
+        self.assertAlmostEqual(fit.mean(1), 1)
+        self.assertGreater(fit.deviation(4), fit.deviation(1))
+        self.assertGreater(fit.deviation(-2), fit.deviation(1))
+
+    def test_expected_improvement(self):
+        ei = rgtuner.expected_improvement
+        self.assertEqual(ei(3, 0, 1), 2)
+        self.assertEqual(ei(0, 0, 1), 0)
+        self.assertAlmostEqual(ei(1, 2, 1), 2 / math.sqrt(2 * math.pi))
+        # a more uncertain score is more likely to beat best
+        self.assertGreater(ei(0, 2, 1), ei(0, 1, 1))
+        self.assertGreater(ei(0, 1, 1), 0)
+
+    def test_candidates_head_for_the_peak(self):
+        observations = [(x, -(x - 1) ** 2) for x in (0, 0.5, 1.5, 2)]
+        candidates, largest = rgtuner.surrogate_candidates(observations, 3,
+                                                           1)
+        self.assertEqual(len(set(candidates)), 3)
+        self.assertAlmostEqual(candidates[0], 1, delta=0.05)
+        self.assertTrue(all(-1 <= x <= 3 for x in candidates))
+        self.assertAlmostEqual(largest, 0.25, delta=0.01)
+
+
+@unittest.skipIf(rgkit is None, 'rgkit is not installed')
+class StatisticsTest(unittest.TestCase):
+
+    def test_sprt_waits_for_enough_decisive_games(self):
+        self.assertEqual(rgtuner.sprt_decision(0, 0, 0.95), 0)
+        self.assertEqual(rgtuner.sprt_decision(10, 9, 0.95), 0)
+        self.assertEqual(rgtuner.sprt_decision(20, 5, 0.95), 1)
+        self.assertEqual(rgtuner.sprt_decision(5, 20, 0.95), -1)
+        # a higher confidence takes more games
+        self.assertEqual(rgtuner.sprt_decision(20, 12, 0.95), 1)
+        self.assertEqual(rgtuner.sprt_decision(20, 12, 0.999), 0)
+
+    def test_ratings_move_towards_the_results(self):
+        ratings = rgtuner.Ratings(['a', 'b', 'c'])
+        self.assertAlmostEqual(ratings.expected('a', 'b'), 0.5)
+        ratings.update('a', 'b', 1)
+        self.assertGreater(ratings.rating['a'], rgtuner.RATING_START)
+        self.assertLess(ratings.rating['b'], rgtuner.RATING_START)
+        self.assertAlmostEqual(ratings.rating['a'] - rgtuner.RATING_START,
+                               rgtuner.RATING_START - ratings.rating['b'])
+        self.assertLess(ratings.deviation['a'], rgtuner.RATING_DEVIATION)
+        self.assertEqual(ratings.deviation['c'], rgtuner.RATING_DEVIATION)
+        self.assertGreater(ratings.expected('a', 'b'), 0.5)
+        self.assertEqual(ratings.encounters['a'], 1)
+        # nothing is learnt from a tie between equals
+        ratings.update('c', 'c', 0.5)
+        self.assertEqual(ratings.rating['c'], rgtuner.RATING_START)
+
+    def test_encounters_fill_a_round_without_repeats(self):
+        ratings = rgtuner.Ratings(['a', 'b', 'e'])
+        pairings = rgtuner.schedule_encounters(ratings, ['a', 'b'],
+                                               ['a', 'b', 'e'], 5)
+        self.assertEqual(len(pairings), 3)
+        self.assertEqual(len(set(frozenset(p) for p in pairings)), 3)
+        self.assertEqual(len(rgtuner.schedule_encounters(
+            ratings, ['a', 'b'], ['a', 'b', 'e'], 1)), 1)
+
+    def test_a_lone_bot_is_not_rated_forever(self):
+        pool = ScriptedPool(lambda bot, index: 1)
+        self.assertEqual(rgtuner.run_rating_tourney(
+            10, [], ['a'], pool, rgtuner.TuneOptions()), 'a')
+        self.assertEqual(pool.played, {})
+
+    def test_paired_difference(self):
+        diffs = {('a', 'e'): [3, 5, 7, None], ('base', 'e'): [1, 1, 1, 1]}
+        mean, error = rgtuner.paired_difference('a', 'base', ['e'], diffs)
+        self.assertAlmostEqual(mean, 4)
+        self.assertAlmostEqual(error, 2 / math.sqrt(3))
+        self.assertEqual(rgtuner.paired_difference('a', 'base', ['e', 'f'],
+                                                   diffs), None)
+        diffs = {('a', 'e'): [None], ('base', 'e'): [1]}
+        self.assertEqual(rgtuner.paired_difference('a', 'base', ['e'], diffs),
+                         None)
+
+
+class ScriptedPool(object):
+    """Stands in for a pool of two processes, in which bot1 of each pairing
+    scores score(bot1, index) to its enemy's 0 on match index."""
+
+    _processes = 2
+
+    def __init__(self, score):
+        self.score = score
+        self.played = collections.Counter()
+
+    def imap_unordered(self, func, jobs):
+        results = []
+        for pairing, matches, bot1, bot2, timeout, simulate in jobs:
+            self.played[pairing] += len(matches)
+            results.append((pairing, [(index, (self.score(bot1, index), 0))
+                                      for index, seed, swap in matches],
+                            'worker'))
+        return ScriptedResults(iter(results))
+
+
+class ScriptedResults(object):
+
+    def __init__(self, results):
+        self.results = results
+
+    def next(self, timeout=None):
+        return next(self.results)
+
+
+@unittest.skipIf(rgkit is None, 'rgkit is not installed')
+class RivalsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        path = os.path.join(self.tmp, 'bot.py')
+        with open(path, 'w') as f:
+            f.write('A_WEIGHT = 1.0\n')
+        self.enemy = rgtuner.Variant(path, (('A_WEIGHT', 9.0),))
+        self.bots = [rgtuner.Variant(path, (('A_WEIGHT', v),))
+                     for v in (2.0, 3.0, 1.0)]
+        self.cache = rgtuner.ResultCache(os.path.join(self.tmp, 'cache'))
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmp)
+
+    def play(self, scores):
+        scores = dict(zip(self.bots, scores))
+        pool = ScriptedPool(lambda bot, index: scores[bot])
+        pairings = [(bot, self.enemy) for bot in self.bots]
+        results = rgtuner.play_pairings(
+            40, pairings, pool, rgtuner.TuneOptions(
+                cache=self.cache, seed=7, confidence=0.95),
+            rivals=[self.bots])
+        return results, pool.played
+
+    def test_rivals_stop_once_the_leader_is_clear(self):
+        results, played = self.play([10, 0, -10])
+        self.assertEqual(len(played), 3)
+        self.assertTrue(all(n < 40 for n in played.values()))
+
+    def test_rivals_of_cached_bots_play_every_match(self):
+        self.cache.put(self.bots[1], self.enemy, 7, 40, 185)
+        self.cache.put(self.bots[2], self.enemy, 7, 40, 149)
+        results, played = self.play([10, 0, -10])
+        # the cached bots can't be compared game by game, so the one bot
+        # left plays them all
+        self.assertEqual(played, {(self.bots[0], self.enemy): 40})
+        self.assertEqual(results[(self.bots[0], self.enemy)], 400)
+        self.assertEqual(results[(self.bots[1], self.enemy)], 185)
+
+
+@unittest.skipIf(rgkit is None, 'rgkit is not installed')
+class PairedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        path = os.path.join(self.tmp, 'bot.py')
+        with open(path, 'w') as f:
+            f.write('A_WEIGHT = 1.0\n')
+        self.enemy = rgtuner.Variant(path, (('A_WEIGHT', 9.0),))
+        self.candidate = rgtuner.Variant(path, (('A_WEIGHT', 2.0),))
+        self.base = rgtuner.Variant(path, ())
+        self.cache = rgtuner.ResultCache(os.path.join(self.tmp, 'cache'))
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmp)
+
+    def score(self, bot, index):
+        # the candidate scores more in all, but only through one lucky seed
+        if bot == self.candidate:
+            return 101 if index < 2 else 0
+        return 1
+
+    def test_later_steps_compare_cached_bots_by_their_seeds(self):
+        options = rgtuner.TuneOptions(cache=self.cache, seed=7)
+        for step in xrange(2):
+            pool = ScriptedPool(self.score)
+            best = rgtuner.run_paired_tourney(
+                40, [self.enemy], [self.candidate, self.base], pool, options)
+            self.assertEqual(best, self.base)
+        # the second step was played from the cache
+        self.assertEqual(pool.played, {})
+        diffs = {}
+        rgtuner.play_pairings(40, [(self.base, self.enemy)], pool,
+                              options._replace(paired=True), diffs=diffs)
+        self.assertEqual(diffs, {(self.base, self.enemy): [2] * 20})
+
+
+@unittest.skipIf(rgkit is None, 'rgkit is not installed')
+class EnemyPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.play_pairings = rgtuner.play_pairings
+        rgtuner.play_pairings = self.record
+        self.played = []
+
+    def tearDown(self):
+        rgtuner.play_pairings = self.play_pairings
+
+    def record(self, matchNum, pairings, pool, options, games=None,
+               rivals=None):
+        self.played.append((pairings, options, games))
+        return dict((pairing, 1) for pairing in pairings)
+
+    def test_candidates_play_each_enemy_on_the_same_seeds(self):
+        enemies = [rgtuner.Variant('a.py', ()), rgtuner.Variant('b.py', ())]
+        candidates = ['x', 'y']
+        enemy_pool = rgtuner.EnemyPool(enemies, [3, 1])
+        enemy_pool.play(8, candidates, None, rgtuner.TuneOptions())
+        enemy_pool.play(8, candidates, None, rgtuner.TuneOptions(seed=5))
+        (_, drawn, games), (_, given, _) = self.played
+        self.assertNotEqual(drawn.seed, None)
+        self.assertEqual(given.seed, 5)
+        self.assertEqual(games, {('x', enemies[0]): 6, ('y', enemies[0]): 6,
+                                 ('x', enemies[1]): 2, ('y', enemies[1]): 2})
+
+    def test_a_resumed_step_is_played_on_the_seed_it_drew(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'checkpoint.json')
+            enemy_pool = rgtuner.EnemyPool([rgtuner.Variant('a.py', ())], [1])
+            enemy_pool.play(8, ['x'], None, rgtuner.TuneOptions(
+                checkpoint=rgtuner.Checkpoint(path)))
+            enemy_pool.play(8, ['x'], None, rgtuner.TuneOptions(
+                checkpoint=rgtuner.Checkpoint.load(path)))
+            (_, first, _), (_, resumed, _) = self.played
+            self.assertEqual(resumed.seed, first.seed)
+        finally:
+            shutil.rmtree(tmp)
+
+
+@unittest.skipIf(rgkit is None, 'rgkit is not installed')
+class ConstantsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def bot(self, source):
+        path = os.path.join(self.tmp, 'bot%d.py' % len(os.listdir(self.tmp)))
+        with open(path, 'w') as f:
+            f.write(source)
+        return path
+
+    def test_finds_the_float_constants(self):
+        path = self.bot('A_WEIGHT = 1.5\n'
+                        'COUNT = 3\n'
+                        'B_WEIGHT = -0.25  # the b\n'
+                        'NAME = "x"\n'
+                        'lower = 2.0\n'
+                        'A_WEIGHT = 9.0\n'
+                        'STATE_WEIGHT = 0.0\n'
+                        'A_EXPONENT = 1.0\n'
+                        'C_BIAS = 0.5\n'
+                        'def f():\n'
+                        '    global STATE_WEIGHT\n')
+        self.assertEqual(list(rgtuner.numeric_constants(path)),
+                         ['A_WEIGHT', 'COUNT', 'B_WEIGHT', 'lower',
+                          'STATE_WEIGHT', 'A_EXPONENT', 'C_BIAS'])
+        self.assertEqual(rgtuner.find_constants(path),
+                         ['A_WEIGHT', 'B_WEIGHT', 'C_BIAS'])
+        self.assertEqual(rgtuner.get_current_value('B_WEIGHT', path), -0.25)
+        self.assertRaises(NameError, rgtuner.get_current_value, 'NAME', path)
+
+    def test_overrides_are_seen_by_module_level_code(self):
+        path = self.bot('A_WEIGHT = 1.5\n'
+                        'DOUBLE = A_WEIGHT * 2\n')
+        module = {}
+        exec(rgtuner.load_code(rgtuner.Variant(path, (('A_WEIGHT', 4.0),))),
+             module)
+        self.assertEqual(module['DOUBLE'], 8.0)
+
+    def test_overrides_of_the_value_in_effect_hash_like_the_file(self):
+        path = self.bot('A_WEIGHT = 1.5\n'
+                        'B_WEIGHT = 2.5\n'
+                        'B_WEIGHT = 3.5\n')
+        plain = rgtuner.bot_hash(rgtuner.Variant(path, ()))
+        self.assertEqual(rgtuner.bot_hash(
+            rgtuner.Variant(path, (('A_WEIGHT', 1.5),))), plain)
+        self.assertNotEqual(rgtuner.bot_hash(
+            rgtuner.Variant(path, (('A_WEIGHT', 2.0),))), plain)
+        # the override wins over the file's second assignment
+        self.assertNotEqual(rgtuner.bot_hash(
+            rgtuner.Variant(path, (('B_WEIGHT', 2.5),))), plain)
+
+    def test_write_value_keeps_the_comment(self):
+        path = self.bot('A_WEIGHT = 1.5\n'
+                        'B_WEIGHT = 2.5  # the b\n')
+        rgtuner.write_value('B_WEIGHT', path, 3.75)
+        with open(path) as f:
+            self.assertEqual(f.read(), 'A_WEIGHT = 1.5\n'
+                                       'B_WEIGHT = 3.75  # the b\n')
+        self.assertEqual(rgtuner.get_current_value('B_WEIGHT', path), 3.75)
+
+    def test_write_value_refuses_split_assignments(self):
+        path = self.bot('A_WEIGHT = \\\n'
+                        '    1.5\n')
+        self.assertRaises(ValueError, rgtuner.write_value, 'A_WEIGHT', path,
+                          1.0)
+
+    def test_write_value_refuses_shared_lines(self):
+        source = 'A_WEIGHT = 1.5; B_WEIGHT = 2.5\n'
+        path = self.bot(source)
+        self.assertRaises(ValueError, rgtuner.write_value, 'A_WEIGHT', path,
+                          1.0)
+        with open(path) as f:
+            self.assertEqual(f.read(), source)
+
+
+if __name__ == '__main__':
+    unittest.main()
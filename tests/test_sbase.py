@@ -0,0 +1,287 @@
+from __future__ import print_function
+import os
+import unittest
+
+try:
+    import rgkit
+except ImportError:
+    rgkit = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def old_robot(m):
+    """Returns a Robot class of the sbase module m that scores tiles with the
+    scorer sbase.py had before its terms became features times weights."""
+
+    class OldRobot(m.Robot):
+
+        def get_tile_goodness(self, loc, game):
+            in_spawn = loc in m.spawn_locs
+            enemies_next_to_loc = self.get_enemy_bots_next_to(loc, game)
+            enemies_next_to_loc_fighting_friendlies = \
+                    self.get_enemies_fighting_friendlies(
+                            enemies_next_to_loc, game)
+            enemies_next_to_loc_to_fight_friendlies = \
+                    self.get_enemies_to_fight_friendlies(enemies_next_to_loc)
+            friendlies_next_to_loc = self.get_friendlies_next_to(loc, game)
+
+            nearby_friendlies_in_spawn = []
+            nearby_friendlies_in_deep_spawn = []
+            for friendly in friendlies_next_to_loc:
+                if friendly.location in m.spawn_locs:
+                    nearby_friendlies_in_spawn.append(friendly)
+                    if m.cant_easily_leave_spawn(friendly.location, game):
+                        nearby_friendlies_in_deep_spawn.append(friendly)
+
+            friendly_in_loc = enemy_in_loc = False
+            if loc != self.location:
+                bot_in_location = m.get_bot_in_location(loc, game)
+                if bot_in_location:
+                    if bot_in_location.player_id == self.player_id:
+                        friendly_in_loc = True
+                    else:
+                        enemy_in_loc = True
+            else:
+                bot_in_location = None
+            distance_to_closest_enemy = self.get_distance_to_closest_bot(
+                game, loc=loc, enemy=True)
+            distance_to_closest_friendly = self.get_distance_to_closest_bot(
+                game, loc=loc, friendly=True)
+            nearby_friendlies_in_trouble = [
+                friendly for friendly in friendlies_next_to_loc
+                if m.bot_is_in_trouble(friendly, game)]
+            enemies_that_could_move_next_to = [
+                ring_loc for ring_loc in m.map_ring2[loc]
+                if ring_loc in game['robots'] and
+                game['robots'][ring_loc].player_id != self.player_id]
+
+            goodness = 0
+            if game['turn'] <= 90:
+                goodness -= in_spawn * ((game['turn'] % 10 == 0) * 50 +
+                                        m.SPAWN_WEIGHT)
+            if game['turn'] <= 90:
+                goodness -= m.cant_easily_leave_spawn(loc, game) * (
+                        game['turn'] % 10) * m.CANT_EASILY_LEAVE_SPAWN_WEIGHT
+            goodness += len(enemies_next_to_loc_fighting_friendlies) * \
+                    m.FIGHTING_FRIENDLY_WEIGHT
+            goodness += len(enemies_next_to_loc_to_fight_friendlies) * \
+                    m.TO_FIGHT_FRIENDLY_WEIGHT
+            goodness -= (len(enemies_next_to_loc) *
+                         m.ADJACENT_ENEMIES_WEIGHT) ** \
+                    m.ADJACENT_ENEMIES_EXPONENT
+            goodness -= friendly_in_loc * m.FRIENDLY_IN_LOC_WEIGHT
+            goodness -= len(nearby_friendlies_in_trouble) * \
+                    m.FRIENDLIES_IN_TROUBLE_WEIGHT
+            if m.could_die_in_loc(self.hp, loc, self.player_id, game):
+                goodness -= m.COULD_DIE_WEIGHT
+            goodness -= m.map_center_dist[loc] * 0.01
+            goodness += (loc == self.location) * m.REMAIN_BIAS
+            if self.hp > 15:
+                goodness -= max(distance_to_closest_enemy, 2) * \
+                        m.CHARGE_WEIGHT
+            else:
+                goodness += min(distance_to_closest_enemy, 2) * \
+                        m.ESCAPE_WEIGHT
+            goodness -= min(distance_to_closest_friendly, 2) * m.GROUP_WEIGHT
+            if enemy_in_loc:
+                goodness -= enemy_in_loc * m.ENEMY_IN_LOC_WEIGHT
+                goodness += (m.bot_is_in_trouble(bot_in_location, game) *
+                             m.ENEMY_IN_TROUBLE_WEIGHT)
+                goodness += m.ENEMY_SUPER_WEAK_WEIGHT * \
+                        (bot_in_location.hp <= 5)
+            if game['turn'] <= 90:
+                if not in_spawn:
+                    goodness -= len(nearby_friendlies_in_spawn) * \
+                            m.NEARBY_FRIENDLIES_IN_SPAWN_WEIGHT
+                goodness -= len(nearby_friendlies_in_deep_spawn) * \
+                        m.NEARBY_FRIENDLIES_IN_DEEP_SPAWN_WEIGHT
+            for enemy in enemies_next_to_loc_fighting_friendlies:
+                if m.is_possible_suicider(enemy, game) and (self.hp <= 15):
+                    goodness -= m.POSSIBLE_SUICIDERS_WEIGHT
+            goodness -= min(len(enemies_that_could_move_next_to), 1) * \
+                    m.SURROUND_WEIGHT
+            goodness -= 999 * (loc in m.future_moves)
+            goodness -= m.MOVE_INTO_ATTACK_WEIGHT * (loc in m.future_attacks)
+            return goodness
+
+    return OldRobot
+
+
+@unittest.skipIf(rgkit is None, 'rgkit is not installed')
+class TileGoodnessTest(unittest.TestCase):
+
+    def setUp(self):
+        import bench
+        import rgtuner
+        self.rgtuner = rgtuner
+        self.states = bench.make_states(100, 1)
+        bot = rgtuner.Variant(os.path.join(ROOT, 'sbase.py'), ())
+        self.module = rgtuner.load_bot(bot, 0)
+        self.old_module = rgtuner.load_bot(bot, 1)
+        # the states of the tests repeat turns, which the modules would take
+        # for the turn they last played
+        for module in (self.module, self.old_module):
+            module.turn_index_turn = module.future_moves_turn = None
+
+    def play(self, robot, state):
+        """Has the robots of player 0 act on state, in order of location.
+        Returns their actions."""
+        actions = []
+        for loc, state_bot in sorted(state['robots'].items()):
+            if state_bot.player_id == 0:
+                robot.location = loc
+                robot.hp = state_bot.hp
+                robot.player_id = state_bot.player_id
+                robot.robot_id = state_bot.robot_id
+                actions.append(robot.act(state))
+        return actions
+
+    def test_tiles_score_as_the_old_scorer_did(self):
+        m = self.module
+        robot = m.Robot()
+        old = old_robot(m)()
+        for state in self.states:
+            for loc, state_bot in sorted(state['robots'].items()):
+                if state_bot.player_id != 0:
+                    continue
+                for r in (robot, old):
+                    r.location = loc
+                    r.hp = state_bot.hp
+                    r.player_id = state_bot.player_id
+                    r.robot_id = state_bot.robot_id
+                robot.act(state)
+                for tile in [loc] + m.map_around_walkable[loc]:
+                    self.assertEqual(robot.get_tile_goodness(tile, state),
+                                     old.get_tile_goodness(tile, state))
+
+    def test_robots_move_as_they_did_with_the_old_scorer(self):
+        robot = self.module.Robot()
+        old = old_robot(self.old_module)()
+        for state in self.states:
+            self.assertEqual(self.play(robot, state), self.play(old, state))
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_numpy_scores_tiles_as_the_scalar_scorer_does(self):
+        m = self.module
+        robot = m.Robot()
+        for state in self.states:
+            for loc, state_bot in sorted(state['robots'].items()):
+                if state_bot.player_id != 0:
+                    continue
+                robot.location = loc
+                robot.hp = state_bot.hp
+                robot.player_id = state_bot.player_id
+                robot.robot_id = state_bot.robot_id
+                robot.act(state)
+                locs = [loc] + m.map_around_walkable[loc]
+                self.assertEqual(robot.get_tile_scores(locs, state),
+                                 [robot.get_tile_goodness(tile, state)
+                                  for tile in locs])
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_robots_move_as_they_do_without_numpy(self):
+        robot = self.module.Robot()
+        scalar = self.old_module.Robot()
+        self.module.USE_NUMPY = True
+        try:
+            for state in self.states:
+                self.assertEqual(self.play(robot, state),
+                                 self.play(scalar, state))
+        finally:
+            self.module.USE_NUMPY = False
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_numpy_chooses_the_attacks_the_scalar_scorer_does(self):
+        m = self.module
+        robot = m.Robot()
+        for state in self.states:
+            for loc, state_bot in sorted(state['robots'].items()):
+                if state_bot.player_id != 0:
+                    continue
+                robot.location = loc
+                robot.hp = state_bot.hp
+                robot.player_id = state_bot.player_id
+                robot.robot_id = state_bot.robot_id
+                robot.act(state)
+                locs = m.map_around_walkable[loc]
+                matrix = numpy.array([robot.get_attack_features(l, state)
+                                      for l in locs], dtype=float)
+                scores = m.score_features(matrix, m.ATTACK_FEATURES,
+                                          m.attack_weights()).tolist()
+                self.assertEqual(
+                    [robot.get_planned_attack_goodness(s, l, state)
+                     for s, l in zip(scores, locs)],
+                    [robot.get_attack_goodness(l, state) for l in locs])
+                scalar = robot.get_best_attack_loc(locs, state)
+                m.USE_NUMPY = True
+                try:
+                    self.assertEqual(robot.get_best_attack_loc(locs, state),
+                                     scalar)
+                finally:
+                    m.USE_NUMPY = False
+
+    def test_robots_act_as_the_baseline_bot_did(self):
+        baseline = self.rgtuner.load_bot(self.rgtuner.Variant(
+            os.path.join(ROOT, 'tests', 'sbase_baseline.py'), ()), 0)
+        baseline.future_moves_turn = None
+        robot = self.module.Robot()
+        old = baseline.Robot()
+        # the baseline bot is slow, so it plays only some of the states
+        for state in self.states[:20]:
+            self.assertEqual(self.play(robot, state), self.play(old, state))
+
+    def test_distances_are_those_of_a_scan_of_the_robots(self):
+        m = self.module
+        robot = m.Robot()
+        kinds = [({}, lambda b: True),
+                 ({'enemy': True}, lambda b: b.player_id != robot.player_id),
+                 ({'friendly': True},
+                  lambda b: b.player_id == robot.player_id)]
+        for state in self.states[:20]:
+            for loc, state_bot in sorted(state['robots'].items()):
+                robot.location = loc
+                robot.player_id = state_bot.player_id
+                robot.hp = state_bot.hp
+                robot.act(state)
+                for tile in [loc] + m.map_around_walkable[loc]:
+                    for kind, counts in kinds:
+                        distances = [
+                            abs(tile[0] - b.location[0]) +
+                            abs(tile[1] - b.location[1])
+                            for b in state['robots'].values()
+                            if b.location not in (tile, loc) and counts(b)]
+                        self.assertEqual(
+                            robot.get_distance_to_closest_bot(
+                                state, loc=tile, **kind),
+                            min(distances or [99999]))
+
+    def test_tile_weights_replace_the_constants(self):
+        m = self.module
+        robot = m.Robot()
+        # the first state is of turn 1, on which no robots spawn
+        state = self.states[0]
+        weights = m.tile_weights(state['turn'])
+        loc, state_bot = sorted(
+            (loc, b) for loc, b in state['robots'].items()
+            if b.player_id == 0)[0]
+        robot.location = loc
+        robot.hp = state_bot.hp
+        robot.player_id = 0
+        robot.act(state)
+        goodness = robot.get_tile_goodness(loc, state)
+        m.TILE_WEIGHTS = [2 * w for w in weights]
+        try:
+            self.assertAlmostEqual(robot.get_tile_goodness(loc, state),
+                                   2 * goodness)
+        finally:
+            m.TILE_WEIGHTS = None
+
+
+if __name__ == '__main__':
+    unittest.main()
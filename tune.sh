@@ -1,3 +1,3 @@
 set -e
 
-for i in "SPAWN_WEIGHT" "CANT_EASILY_LEAVE_SPAWN_WEIGHT" "FIGHTING_FRIENDLY_WEIGHT" "TO_FIGHT_FRIENDLY_WEIGHT" "ADJACENT_ENEMIES_WEIGHT" "FRIENDLY_IN_LOC_WEIGHT" "FRIENDLIES_IN_TROUBLE_WEIGHT" "REMAIN_BIAS" "COULD_DIE_WEIGHT" "CHARGE_WEIGHT" "ESCAPE_WEIGHT" "GROUP_WEIGHT" "ENEMY_IN_LOC_WEIGHT" "ENEMY_IN_TROUBLE_WEIGHT" "ENEMY_SUPER_WEAK_WEIGHT" "NEARBY_FRIENDLIES_IN_SPAWN_WEIGHT" "NEARBY_FRIENDLIES_IN_DEEP_SPAWN_WEIGHT" "POSSIBLE_SUICIDERS_WEIGHT" "SURROUND_WEIGHT" "MULTIPLE_ATTACK_WEIGHT" "FRIENDLY_LOC_ATTACK_WEIGHT" "ENEMY_ATTACK_HP_WEIGHT" "ADJACENT_ENEMY_ATTACK_WEIGHT" "ADJACENT_FRIENDLY_ATTACK_WEIGHT" "NEARBY_TROUBLED_ENEMY_ATTACK_WEIGHT" "NEARBY_TROUBLED_FRIENDLY_ATTACK_WEIGHT" "ATTACK_IN_FUTURE_MOVES_WEIGHT" "MULTIPLE_ATTACK_WEIGHT"; do python2 rgtuner.py $i $@; done
+python2 rgtuner.py ALL "$@"